@@ -1,20 +1,21 @@
 # analytics.py
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime, timedelta, timezone
 import math
 import numpy as np
-from database import get_connection
+from database import DATA_RETENTION_DAYS, db_cursor
+import grid_snapshot
+import history
+import rolling
+import rollups
+from spatial import bbox_for_radius, haversine_sql
 
 router = APIRouter(prefix="/aqi/history", tags=["history"])
 
 # ---------------------------
 # Helpers
 # ---------------------------
-def deg_radius_for_km(km: float) -> float:
-    # approximate: 1 deg latitude ~ 111 km
-    return max(0.01, km / 111.0)
-
 def rows_to_dicts(cursor, rows):
     cols = [d.name for d in cursor.description]
     return [dict(zip(cols, r)) for r in rows]
@@ -32,186 +33,183 @@ def compute_basic_stats(values: List[float]):
         "max": float(np.nanmax(arr)),
     }
 
-def compute_rolling(values: List[Optional[float]], window: int = 3):
-    """Simple rolling average; returns list aligned with input (None where not enough)."""
-    out = []
-    buf = []
-    for v in values:
-        if v is None:
-            buf.append(None)
+def rolling_columns(field: str, values, window: int, aggs: List[str]):
+    """
+    Extra columns for one field: mean -> <field>_roll, max -> <field>_roll_max,
+    ewma -> <field>_ewma (span = window), pNN -> <field>_roll_pNN.
+    """
+    out = {}
+    for agg in aggs:
+        if agg == "mean":
+            out[f"{field}_roll"] = rolling.rolling_mean(values, window)
+        elif agg == "max":
+            out[f"{field}_roll_max"] = rolling.rolling_max(values, window)
+        elif agg == "ewma":
+            out[f"{field}_ewma"] = rolling.ewma(values, window)
         else:
-            buf.append(float(v))
-        # compute last `window` non-None
-        valid = [x for x in buf[-window:] if x is not None]
-        out.append(float(np.mean(valid)) if len(valid) else None)
+            out[f"{field}_roll_{agg}"] = rolling.rolling_percentile(values, window, float(agg[1:]))
     return out
 
+def _parse_aggs(aggs: str):
+    names = [a.strip() for a in aggs.split(",") if a.strip()]
+    for a in names:
+        if a in ("mean", "max", "ewma"):
+            continue
+        try:
+            q = float(a[1:]) if a.startswith("p") else -1
+        except ValueError:
+            q = -1
+        if not 0 <= q <= 100:
+            raise HTTPException(status_code=422, detail=f"unknown aggregation {a!r} (mean, max, ewma, p0-p100)")
+    return names
+
 # ---------------------------
 # DB fetchers (air_quality primary)
 # ---------------------------
 def fetch_history_from_air_quality(lat: float, lon: float, days: int, radius_km: float):
-    rdeg = deg_radius_for_km(radius_km)
+    min_lat, max_lat, min_lon, max_lon = bbox_for_radius(lat, lon, radius_km)
     since = datetime.now(timezone.utc) - timedelta(days=days)
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp
-        FROM air_quality
-        WHERE ABS(latitude - %s) <= %s
-          AND ABS(longitude - %s) <= %s
-          AND timestamp >= %s
-        ORDER BY timestamp ASC
-        """,
-        (lat, rdeg, lon, rdeg, since)
-    )
-    rows = cur.fetchall()
-    out = rows_to_dicts(cur, rows)
-    cur.close()
-    conn.close()
-    return out
-
-def fetch_history_from_india_aqi_nearest(lat: float, lon: float, days: int):
-    """
-    If no air_quality history found, fall back to recent india_aqi grid
-    within last `days`. We fetch nearest N rows within bounding box.
-    """
-    since = datetime.now(timezone.utc) - timedelta(days=days)
-    conn = get_connection()
-    cur = conn.cursor()
-    # get nearest points inside india_aqi in timeframe
-    cur.execute(
-        """
-        SELECT lat AS latitude, lon AS longitude, aqi, pm25, pm10, co, no2, so2, o3, dt AS timestamp
-        FROM india_aqi
-        WHERE dt >= %s
-        ORDER BY ABS(lat - %s) + ABS(lon - %s)
-        LIMIT 200
-        """,
-        (since, lat, lon)
-    )
-    rows = cur.fetchall()
-    out = rows_to_dicts(cur, rows)
-    cur.close()
-    conn.close()
-    return out
+    with db_cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp
+            FROM air_quality
+            WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s))
+              AND {haversine_sql("latitude", "longitude")} <= %s
+              AND timestamp >= %s
+            ORDER BY timestamp ASC
+            """,
+            (min_lon, min_lat, max_lon, max_lat, lat, lat, lon, radius_km, since)
+        )
+        rows = cur.fetchall()
+        return rows_to_dicts(cur, rows)
+
+def rollup_cells(cells):
+    """history.resolve_cells output as (lat, lon, weight) for the rollup readers."""
+    return [(c[0], c[1], c[3]) for c in cells]
+
+def fetch_rollup_series(lat: float, lon: float, days: int, radius_km: float, granularity: str):
+    """Per-bucket rollup stats for the cells around lat/lon, or ([], []) if none."""
+    since = datetime.utcnow() - timedelta(days=days)
+    with db_cursor() as cur:
+        cells = history.resolve_cells(cur, lat, lon, radius_km)
+        if not cells:
+            return cells, []
+        return cells, rollups.series(cur, rollup_cells(cells), since, granularity)
 
 # ---------------------------
 # Endpoints
 # ---------------------------
 @router.get("/raw", summary="Raw history rows from india_aqi")
-def raw_history(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0)):
+def raw_history(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0),
+                limit: int = Query(history.RAW_ROW_LIMIT, ge=100, le=20000), after: Optional[datetime] = None):
     """
-    Return raw DB rows near lat/lon over last `days`.
-    Fetches from india_aqi table only.
+    Return raw DB rows of the grid cells within radius_km of lat/lon (the
+    nearest cell if none are) over last `days`, time-ordered, each with its
+    cell's distance. Fetches from india_aqi table only.
+    Pages hold at most `limit` rows; pass `next_after` back as `after` for
+    the next page (null on the last one).
     """
-    # Always use india_aqi data
-    rows = fetch_history_from_india_aqi_nearest(lat, lon, days)
-    source = "india_aqi"
-    return {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": source, "rows": rows}
+    since = datetime.utcnow() - timedelta(days=days)
+    if after is not None and after.tzinfo is not None:
+        after = after.astimezone(timezone.utc).replace(tzinfo=None)
+    with db_cursor() as cur:
+        cells = history.resolve_cells(cur, lat, lon, radius_km)
+        rows, next_after = history.raw_rows(cur, cells, since, limit, after) if cells else ([], None)
+    return {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": "india_aqi",
+            "cells": [{"latitude": c[0], "longitude": c[1], "distance_km": round(c[2], 2), "weight": round(c[3], 4)}
+                      for c in cells],
+            "rows": rows, "next_after": next_after}
 
 @router.get("/timeseries", summary="Cleaned timeseries for charting")
-def timeseries(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0), rolling_window: int = Query(3, ge=1, le=30)):
+def timeseries(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0),
+               rolling_window: int = Query(3, ge=1, le=30),
+               aggs: str = Query("mean", description="comma-separated rolling aggregations: mean, max, ewma, p<q>"),
+               rolling_fields: str = Query("aqi,pm25", description="comma-separated fields to roll"),
+               shape: Literal["rows", "columns"] = "rows"):
     """
     Return time-ordered series of {timestamp, aqi, pm25, pm10, ...}
-    plus rolling averages for AQI and PM2.5 (window configurable).
-    Fetches from india_aqi table only.
+    plus rolling aggregations for AQI and PM2.5 (window configurable).
+    Reads the hourly rollup (daily beyond its retention) of the grid
+    cells within radius_km, pooled per bucket, straight into arrays.
+    shape=columns returns {"timestamp": [...], "aqi": [...], ...}
+    instead of one object per timestamp.
     """
-    # Always use india_aqi data
-    raw = fetch_history_from_india_aqi_nearest(lat, lon, days)
-    source = "india_aqi"
-
-    # Normalize timestamps to ISO, ensure floats or None
-    timestamps = []
-    aqi_vals = []
-    pm25_vals = []
-    pm10_vals = []
-    co_vals = []
-    no2_vals = []
-    so2_vals = []
-    o3_vals = []
-
-    for r in raw:
-        ts = r.get("timestamp")
-        if isinstance(ts, str):
-            try:
-                ts_iso = ts
-            except:
-                ts_iso = str(ts)
-        elif hasattr(ts, "isoformat"):
-            ts_iso = ts.isoformat()
-        else:
-            ts_iso = str(ts)
-        timestamps.append(ts_iso)
-        # push numeric or None
-        aqi_vals.append(None if r.get("aqi") is None else float(r.get("aqi")))
-        pm25_vals.append(None if r.get("pm25") is None else float(r.get("pm25")))
-        pm10_vals.append(None if r.get("pm10") is None else float(r.get("pm10")))
-        co_vals.append(None if r.get("co") is None else float(r.get("co")))
-        no2_vals.append(None if r.get("no2") is None else float(r.get("no2")))
-        so2_vals.append(None if r.get("so2") is None else float(r.get("so2")))
-        o3_vals.append(None if r.get("o3") is None else float(r.get("o3")))
-
-    aqi_roll = compute_rolling(aqi_vals, window=rolling_window)
-    pm25_roll = compute_rolling(pm25_vals, window=rolling_window)
-
-    series = []
-    for i, ts in enumerate(timestamps):
-        series.append({
-            "timestamp": ts,
-            "aqi": aqi_vals[i],
-            "aqi_roll": aqi_roll[i],
-            "pm25": pm25_vals[i],
-            "pm25_roll": pm25_roll[i],
-            "pm10": pm10_vals[i],
-            "co": co_vals[i],
-            "no2": no2_vals[i],
-            "so2": so2_vals[i],
-            "o3": o3_vals[i],
-        })
-
-    return {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": source, "series": series}
+    names = _parse_aggs(aggs)
+    fields = [f.strip() for f in rolling_fields.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in rollups.METRICS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"unknown rolling field(s): {', '.join(unknown)}")
+
+    granularity = rollups.granularity_for(days)
+    since = datetime.utcnow() - timedelta(days=days)
+    with db_cursor() as cur:
+        cells = history.resolve_cells(cur, lat, lon, radius_km)
+        buckets, _, means = rollups.columns(cur, rollup_cells(cells), since, granularity) if cells else ([], None, {})
+
+    columns = {"timestamp": [b.isoformat() for b in buckets]}
+    for m in ("aqi", "pm25", "pm10", "co", "no2", "so2", "o3"):
+        if m not in means:
+            columns[m] = []
+            continue
+        columns[m] = means[m]
+        if m in fields:
+            columns.update(rolling_columns(m, means[m], rolling_window, names))
+    columns = {k: v if k == "timestamp" else rolling.to_json(v) for k, v in columns.items()}
+
+    meta = {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": "india_aqi",
+            "granularity": granularity, "cells": len(cells)}
+    if shape == "columns":
+        return {**meta, "columns": columns}
+    keys = list(columns)
+    series = [dict(zip(keys, row)) for row in zip(*columns.values())]
+    return {**meta, "series": series}
+
+def latest_record(record, snapshot=None):
+    """summary's `latest`, the same keys whether read from the snapshot or the DB."""
+    out = {k: record.get(k) for k in ("latitude", "longitude", "timestamp") + history.METRICS}
+    out["snapshot"] = snapshot
+    return out
 
 @router.get("/summary", summary="Summary statistics for the period")
 def summary(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0)):
     """
-    Basic summary: mean/median/std/min/max/count for AQI and main pollutants,
-    plus latest value if present.
-    Fetches from india_aqi table only.
+    Basic summary: mean/median/std/min/max/count for AQI and main pollutants
+    over the grid cells within radius_km, plus latest value if present.
+    Aggregated in SQL: over the raw rows while they are retained, over the
+    daily rollup (median of daily means) for longer windows.
     """
-    # Always use india_aqi data
-    raw = fetch_history_from_india_aqi_nearest(lat, lon, days)
-    source = "india_aqi"
-
-    if not raw:
+    since = datetime.utcnow() - timedelta(days=days)
+    granularity = "raw" if days <= DATA_RETENTION_DAYS else "daily"
+    # Latest value comes from the in-memory sweep snapshot when it covers this location
+    snap = grid_snapshot.current()
+    k = snap.nearest(lat, lon)
+    latest = None
+    if k is not None:
+        latest = latest_record(snap.record(k), snap.info())
+
+    with db_cursor() as cur:
+        cells = history.resolve_cells(cur, lat, lon, radius_km)
+        readings, stats = 0, None
+        if cells and granularity == "raw":
+            readings, stats = history.summary_stats(cur, cells, since)
+        elif cells:
+            readings, stats = rollups.totals(cur, rollup_cells(cells), since, granularity)
+        if readings and latest is None:
+            row = history.latest_reading(cur, cells[0])
+            latest = latest_record(row) if row else None
+
+    if not readings:
         return {"latitude": lat, "longitude": lon, "days": days, "source": "none", "summary": None}
 
-    aqi = [r.get("aqi") for r in raw]
-    pm25 = [r.get("pm25") for r in raw]
-    pm10 = [r.get("pm10") for r in raw]
-    co = [r.get("co") for r in raw]
-    no2 = [r.get("no2") for r in raw]
-    so2 = [r.get("so2") for r in raw]
-    o3 = [r.get("o3") for r in raw]
-    timestamps = [r.get("timestamp") for r in raw]
-
-    stats = {
-        "aqi": compute_basic_stats(aqi),
-        "pm25": compute_basic_stats(pm25),
-        "pm10": compute_basic_stats(pm10),
-        "co": compute_basic_stats(co),
-        "no2": compute_basic_stats(no2),
-        "so2": compute_basic_stats(so2),
-        "o3": compute_basic_stats(o3),
-    }
-
-    latest = raw[-1] if raw else None
     return {
         "latitude": lat,
         "longitude": lon,
         "days": days,
         "radius_km": radius_km,
-        "source": source,
+        "source": "india_aqi",
+        "granularity": granularity,
+        "cells": len(cells),
         "summary": {
             "stats": stats,
             "latest": latest
@@ -221,31 +219,21 @@ def summary(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_
 @router.get("/daily", summary="Daily aggregated averages")
 def daily(lat: float, lon: float, days: int = Query(30, ge=1, le=365), radius_km: float = Query(70.0, gt=0)):
     """
-    Return daily aggregated averages (date, avg_aqi, avg_pm25, avg_pm10, count)
-    from india_aqi table only.
+    Return daily aggregated averages (day, avg_aqi, avg_pm25, avg_pm10,
+    min/max AQI, cnt) for the grid cells within radius_km, from the daily rollup.
     """
-    since = datetime.now(timezone.utc) - timedelta(days=days)
-    
-    # Always use india_aqi data
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT date_trunc('day', dt) AS day,
-               AVG(aqi) FILTER (WHERE aqi IS NOT NULL) AS avg_aqi,
-               AVG(pm25) FILTER (WHERE pm25 IS NOT NULL) AS avg_pm25,
-               AVG(pm10) FILTER (WHERE pm10 IS NOT NULL) AS avg_pm10,
-               COUNT(*) AS cnt
-        FROM india_aqi
-        WHERE dt >= %s
-        GROUP BY day
-        ORDER BY day ASC
-        LIMIT 365
-        """,
-        (since,)
-    )
-    rows = cur.fetchall()
-    india_daily = rows_to_dicts(cur, rows)
-    cur.close()
-    conn.close()
-    return {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": "india_aqi", "daily": india_daily}
+    cells, buckets = fetch_rollup_series(lat, lon, days, radius_km, "daily")
+    india_daily = [
+        {
+            "day": b,
+            "avg_aqi": st["aqi"]["mean"],
+            "avg_pm25": st["pm25"]["mean"],
+            "avg_pm10": st["pm10"]["mean"],
+            "min_aqi": st["aqi"]["min"],
+            "max_aqi": st["aqi"]["max"],
+            "cnt": n,
+        }
+        for b, n, st in buckets
+    ]
+    return {"latitude": lat, "longitude": lon, "days": days, "radius_km": radius_km, "source": "india_aqi",
+            "cells": len(cells), "daily": india_daily}
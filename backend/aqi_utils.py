@@ -2,6 +2,7 @@
 # Full AQI conversion for PM2.5, PM10, NO2, O3, SO2, CO
 
 from typing import Optional, Dict
+import numpy as np
 
 def _linear(aqi_lo, aqi_hi, conc_lo, conc_hi, conc):
     """Linear interpolation helper."""
@@ -141,3 +142,68 @@ def compute_aqi_for_row(conc_dict: Dict[str, float]) -> Dict[str, int]:
         "co_aqi": co_aqi,
         "aqi": overall
     }
+
+
+# ---------- VECTORIZED (column arrays) ----------
+POLLUTANT_BREAKPOINTS = {
+    "pm25": pm25_bp,
+    "pm10": pm10_bp,
+    "no2": no2_bp,
+    "o3": o3_bp,
+    "so2": so2_bp,
+    "co": co_bp,
+}
+
+
+def _bp_arrays(bp):
+    """(clo, chi, alo, slope) arrays; slope is computed exactly as _linear does."""
+    clo, chi, alo, ahi = (np.array(col, dtype=float) for col in zip(*bp))
+    return clo, chi, alo, (ahi - alo) / (chi - clo)
+
+
+_BP_ARRAYS = {name: _bp_arrays(bp) for name, bp in POLLUTANT_BREAKPOINTS.items()}
+
+
+def sub_index_batch(conc, pollutant: str) -> np.ndarray:
+    """
+    Vectorized *_to_aqi: float array of sub-indices, NaN where conc is NaN.
+    Matches the scalar functions exactly, including 500 for values outside
+    (or between) the breakpoint ranges.
+    """
+    c = np.asarray(conc, dtype=float)
+    clo, chi, alo, slope = _BP_ARRAYS[pollutant]
+    # Ranges are sorted and disjoint: the only candidate is the last one starting <= c
+    idx = np.searchsorted(clo, c, side="right") - 1
+    k = np.clip(idx, 0, len(clo) - 1)
+    lo = clo[k]
+    inside = (idx >= 0) & (c <= chi[k])
+    with np.errstate(invalid="ignore"):
+        linear = np.trunc(slope[k] * (c - lo) + alo[k])
+    out = np.where(inside, linear, 500.0)
+    out[np.isnan(c)] = np.nan
+    return out
+
+
+def compute_aqi_batch(conc_cols: Dict[str, "np.ndarray"]) -> Dict[str, np.ndarray]:
+    """
+    Column-wise compute_aqi_for_row. `conc_cols` maps pollutant name to an
+    array of concentrations (NaN or missing key = not measured). Returns
+    "<pollutant>_aqi" sub-index arrays plus "aqi", the per-row maximum
+    (NaN where no pollutant was measured).
+    """
+    n = None
+    for v in conc_cols.values():
+        n = np.shape(v)
+        break
+    if n is None:
+        raise ValueError("conc_cols is empty")
+
+    out = {}
+    overall = np.full(n, np.nan)
+    for name in POLLUTANT_BREAKPOINTS:
+        col = conc_cols.get(name)
+        sub = np.full(n, np.nan) if col is None else sub_index_batch(col, name)
+        out[f"{name}_aqi"] = sub
+        overall = np.fmax(overall, sub)
+    out["aqi"] = overall
+    return out
@@ -0,0 +1,53 @@
+# backend/async_support.py
+# Shared async HTTP client and DB offload for the async request path.
+#
+# Outbound HTTP goes through one httpx.AsyncClient (keep-alive connection
+# reuse). psycopg2 is blocking, so DB work runs on a dedicated executor
+# sized to the connection pool rather than on the event loop or the
+# framework's shared threadpool.
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import httpx
+from database import DB_POOL_MAX
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+
+_client = None
+_db_executor = None
+
+
+def get_http_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            headers={"User-Agent": "AQI-Insight-App"},
+        )
+    return _client
+
+
+def _get_db_executor():
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+    return _db_executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking DB helper off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(fn, *args, **kwargs))
+
+
+async def close():
+    global _client, _db_executor
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+        _db_executor = None
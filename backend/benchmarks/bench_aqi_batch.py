@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_aqi_batch.py
+# Throughput of compute_aqi_batch vs per-row compute_aqi_for_row, with an
+# exact-equality check of the two paths.
+#
+# Run from backend/:  python -m benchmarks.bench_aqi_batch
+import math
+import time
+import numpy as np
+from aqi_utils import POLLUTANT_BREAKPOINTS, compute_aqi_batch, compute_aqi_for_row
+
+ROWS = 1_000_000
+SCALAR_ROWS = 100_000
+NAN_FRACTION = 0.05
+
+
+def make_columns(n, rng):
+    cols = {}
+    for name, bp in POLLUTANT_BREAKPOINTS.items():
+        top = bp[-1][1]
+        col = rng.uniform(-0.05 * top, 1.1 * top, n)
+        # exercise every breakpoint edge and the gaps between ranges
+        edges = np.array([v for clo, chi, _, _ in bp for v in (clo, chi, (chi + 0.05))])
+        pick = rng.random(n) < 0.1
+        col[pick] = rng.choice(edges, pick.sum())
+        col[rng.random(n) < NAN_FRACTION] = np.nan
+        cols[name] = col
+    return cols
+
+
+def scalar_rows(cols, n):
+    names = list(cols)
+    out = []
+    for i in range(n):
+        row = {k: (None if math.isnan(cols[k][i]) else float(cols[k][i])) for k in names}
+        try:
+            out.append(compute_aqi_for_row(row))
+        except ValueError:  # every pollutant missing
+            out.append(None)
+    return out
+
+
+def check_equal(batch, scalar):
+    for i, ref in enumerate(scalar):
+        if ref is None:
+            assert math.isnan(batch["aqi"][i]), i
+            continue
+        for key, val in ref.items():
+            got = batch[key][i]
+            assert (val is None and math.isnan(got)) or got == val, (i, key, val, got)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    cols = make_columns(ROWS, rng)
+
+    t = time.perf_counter()
+    scalar = scalar_rows(cols, SCALAR_ROWS)
+    scalar_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    batch = compute_aqi_batch(cols)
+    batch_s = time.perf_counter() - t
+
+    check_equal(batch, scalar)
+    scalar_rps = SCALAR_ROWS / scalar_s
+    batch_rps = ROWS / batch_s
+    print(f"scalar  {SCALAR_ROWS:>9,} rows  {scalar_s:8.3f} s  {scalar_rps:>14,.0f} rows/s")
+    print(f"batch   {ROWS:>9,} rows  {batch_s:8.3f} s  {batch_rps:>14,.0f} rows/s")
+    print(f"speedup {batch_rps / scalar_rps:.0f}x; first {SCALAR_ROWS:,} rows identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# backend/benchmarks/bench_bulk_load.py
+# executemany vs execute_values vs COPY + merge for india_aqi-shaped rows.
+#
+# Each run loads into a fresh scratch table (bench_india_aqi, dropped
+# afterwards), then loads the same rows again to time the all-duplicates
+# case. Needs DATABASE_URL / DB_* pointing at a scratch-safe database.
+#
+# Run from backend/:  python -m benchmarks.bench_bulk_load [--sizes 1000 100000]
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from bulk_load import copy_merge
+from database import db_cursor
+
+TABLE = "bench_india_aqi"
+INDIA_AQI_COLUMNS = ("lat", "lon", "dt", "pm25", "pm10", "no2", "so2", "o3", "co", "aqi")
+INSERT = f"INSERT INTO {TABLE} ({', '.join(INDIA_AQI_COLUMNS)}) VALUES ({', '.join(['%s'] * 10)}) ON CONFLICT (lat, lon, dt) DO NOTHING"
+INSERT_VALUES = f"INSERT INTO {TABLE} ({', '.join(INDIA_AQI_COLUMNS)}) VALUES %s ON CONFLICT (lat, lon, dt) DO NOTHING"
+
+
+def make_rows(n, rng):
+    base = datetime(2025, 1, 1)
+    rows = []
+    for i in range(n):
+        cell, sweep = divmod(i, 1000)
+        lat, lon = 6 + (cell % 33), 68 + (cell // 33) % 31
+        rows.append((float(lat) + sweep * 1e-4, float(lon), base + timedelta(hours=12 * cell),
+                     rng.uniform(5, 300), rng.uniform(10, 400), rng.uniform(1, 80),
+                     rng.uniform(1, 40), rng.uniform(5, 120), rng.uniform(100, 3000),
+                     rng.randint(20, 400)))
+    return rows
+
+
+def load_executemany(cur, rows):
+    cur.executemany(INSERT, rows)
+    return None   # rowcount only reflects the last statement
+
+
+def load_execute_values(cur, rows):
+    execute_values(cur, INSERT_VALUES, rows, page_size=1000)
+    return None   # rowcount only reflects the last page
+
+
+def load_copy(cur, rows):
+    return copy_merge(cur, TABLE, INDIA_AQI_COLUMNS, ("lat", "lon", "dt"), rows)[0]
+
+
+METHODS = {"executemany": load_executemany, "execute_values": load_execute_values, "copy": load_copy}
+
+
+def reset():
+    with db_cursor(commit=True) as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (LIKE india_aqi INCLUDING ALL)")
+
+
+def run(name, rows):
+    timings, reported = [], []
+    for _ in range(2):   # fresh load, then all duplicates
+        started = time.perf_counter()
+        with db_cursor(commit=True) as cur:
+            reported.append(METHODS[name](cur, rows))
+        timings.append(time.perf_counter() - started)
+    with db_cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        count = cur.fetchone()[0]
+    return timings, reported[0], count
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    ap.add_argument("--methods", nargs="+", default=list(METHODS), choices=list(METHODS))
+    args = ap.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'rows':>8} {'method':>15} {'fresh s':>9} {'rows/s':>10} {'dupes s':>9} {'in table':>9} {'inserted':>9}")
+    try:
+        for n in args.sizes:
+            rows = make_rows(n, rng)
+            for name in args.methods:
+                reset()
+                (fresh, dupes), reported, count = run(name, rows)
+                print(f"{n:>8} {name:>15} {fresh:>9.3f} {n / fresh:>10.0f} {dupes:>9.3f} {count:>9} "
+                      f"{'-' if reported is None else reported:>9}")
+    finally:
+        with db_cursor(commit=True) as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/bench_heatmap_encoding.py
+# Response size and encode time of each heatmap format vs the JSON path.
+#
+# Run from backend/:  python -m benchmarks.bench_heatmap_encoding
+import json
+import time
+import numpy as np
+import heatmap_encoding
+
+OUT_RES = (80, 120, 200)
+REPEATS = 20
+BOUNDS = (12.0, 14.0, 77.0, 79.0)
+
+
+def json_body(grid):
+    lats = np.linspace(BOUNDS[0], BOUNDS[1], grid.shape[0]).tolist()
+    lons = np.linspace(BOUNDS[2], BOUNDS[3], grid.shape[1]).tolist()
+    return json.dumps({"grid_lats": lats, "grid_lons": lons, "grid_aqi": grid.tolist()}).encode()
+
+
+def b64_body(kind):
+    return lambda grid: json.dumps({"grid_aqi_b64": heatmap_encoding.encode_b64(grid, kind)}).encode()
+
+
+ENCODERS = {
+    "json": json_body,
+    "u16": lambda g: heatmap_encoding.encode_binary(g, BOUNDS, "u16"),
+    "u8": lambda g: heatmap_encoding.encode_binary(g, BOUNDS, "u8"),
+    "u16_b64": b64_body("u16"),
+    "u8_b64": b64_body("u8"),
+    "png": heatmap_encoding.encode_png,
+}
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'format':<8} {'out_res':>7} {'bytes':>9} {'vs json':>8} {'encode ms':>10}")
+    for out_res in OUT_RES:
+        y, x = np.mgrid[0:1:out_res * 1j, 0:1:out_res * 1j]
+        grid = np.clip(120 + 80 * np.sin(6 * x) * np.cos(4 * y) + rng.normal(0, 3, x.shape), 0, 500)
+        json_size = None
+        for name, encode in ENCODERS.items():
+            timings = []
+            for _ in range(REPEATS):
+                t = time.perf_counter()
+                body = encode(grid)
+                timings.append(time.perf_counter() - t)
+            json_size = json_size or len(body)
+            print(f"{name:<8} {out_res:>7} {len(body):>9} {len(body) / json_size:>7.1%} "
+                  f"{np.median(timings) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# backend/benchmarks/bench_interpolation.py
+# Latency and peak memory of each heatmap interpolation backend, after a
+# check that a sample duplicating a node's coordinates (a live reading
+# blended onto a grid cell) stays within the range of the inputs.
+#
+# Run from backend/:  python -m benchmarks.bench_interpolation
+import time
+import tracemalloc
+import numpy as np
+from interpolation import BACKENDS, interpolate
+
+SAMPLE_GRIDS = (5, 8, 11)
+OUT_RES = (80, 120, 200)
+REPEATS = 5
+
+
+def make_samples(sample_grid, rng):
+    node_lats = np.linspace(12.0, 14.0, sample_grid)
+    node_lons = np.linspace(77.0, 79.0, sample_grid)
+    ml, mo = np.meshgrid(node_lats, node_lons, indexing="ij")
+    values = 80 + 60 * np.sin(ml * 2) * np.cos(mo * 3) + rng.normal(0, 5, ml.shape)
+    return ml.ravel(), mo.ravel(), values.ravel(), (node_lats, node_lons)
+
+
+def measure(method, lats, lons, values, lattice, out_res):
+    grid_lats = np.linspace(12.0, 14.0, out_res)
+    grid_lons = np.linspace(77.0, 79.0, out_res)
+    timings = []
+    for _ in range(REPEATS):
+        t = time.perf_counter()
+        interpolate(lats, lons, values, grid_lats, grid_lons, method=method, lattice=lattice)
+        timings.append(time.perf_counter() - t)
+    tracemalloc.start()
+    interpolate(lats, lons, values, grid_lats, grid_lons, method=method, lattice=lattice)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(timings)) * 1000, peak / 1e6
+
+
+def check_duplicate_node(rng):
+    """Flat 194-202 grid plus a 178 reading at one node: no backend may overshoot."""
+    node_lats = np.arange(18.0, 22.01, 0.5)
+    node_lons = np.arange(72.0, 76.01, 0.5)
+    ml, mo = np.meshgrid(node_lats, node_lons, indexing="ij")
+    lats = np.append(ml.ravel(), 20.0)
+    lons = np.append(mo.ravel(), 74.0)
+    values = np.append(rng.uniform(194, 202, ml.size), 178.0)
+    for method in BACKENDS:
+        grid = interpolate(lats, lons, values, np.linspace(19, 21, 80), np.linspace(73, 75, 80),
+                           method=method, lattice=(node_lats, node_lons))
+        assert 178.0 <= grid.min() and grid.max() <= 202.0, (method, grid.min(), grid.max())
+
+
+def main():
+    rng = np.random.default_rng(0)
+    check_duplicate_node(rng)
+    print("duplicate-node check passed")
+    print(f"{'method':<11} {'samples':>7} {'out_res':>7} {'median ms':>10} {'peak MB':>8}")
+    for sample_grid in SAMPLE_GRIDS:
+        lats, lons, values, lattice = make_samples(sample_grid, rng)
+        for out_res in OUT_RES:
+            for method in BACKENDS:
+                ms, mb = measure(method, lats, lons, values, lattice, out_res)
+                print(f"{method:<11} {sample_grid ** 2:>7} {out_res:>7} {ms:>10.2f} {mb:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
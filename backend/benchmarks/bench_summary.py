@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_summary.py
+# /aqi/history/summary aggregation: rows pulled into Python vs one SQL
+# statement over the raw rows vs one statement over the daily rollup.
+#
+# Seeds a scratch schema (bench_summary, dropped afterwards) with hourly
+# readings for a block of grid cells over the last year, then times each
+# method per window. "payload" is what crosses the wire: result rows and
+# their size as text (psycopg2 uses the text protocol).
+# Needs DATABASE_URL / DB_* pointing at a scratch-safe database.
+#
+# Run from backend/:  python -m benchmarks.bench_summary [--days 30 365] [--cells 9]
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+import rollups
+from analytics import compute_basic_stats, rows_to_dicts
+from history import METRICS, summary_stats
+from database import db_cursor
+
+SCHEMA = "bench_summary"
+CENTER = (28.5, 77.25)
+STEP = 0.25
+
+
+def seed(cells_per_side, days):
+    lat0, lon0 = CENTER
+    half = cells_per_side // 2
+    cells = [(round(lat0 + i * STEP, 4), round(lon0 + j * STEP, 4))
+             for i in range(-half, half + 1) for j in range(-half, half + 1)]
+    with db_cursor(commit=True) as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        for table in ("india_aqi", "india_aqi_cells", "india_aqi_hourly", "india_aqi_daily"):
+            cur.execute(f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)")
+        cur.execute(f"SET LOCAL search_path = {SCHEMA}, public")
+        cur.execute(
+            """
+            INSERT INTO india_aqi (lat, lon, dt, pm25, pm10, no2, so2, o3, co, aqi)
+            SELECT c.lat, c.lon, ts,
+                   5 + random() * 250, 10 + random() * 350, 1 + random() * 80, 1 + random() * 40,
+                   5 + random() * 120, 0.1 + random() * 5, (20 + random() * 380)::int
+            FROM unnest(%s::float8[], %s::float8[]) AS c(lat, lon),
+                 generate_series(date_trunc('hour', now() AT TIME ZONE 'utc') - make_interval(days => %s),
+                                 date_trunc('hour', now() AT TIME ZONE 'utc'), interval '1 hour') AS ts
+            """,
+            ([c[0] for c in cells], [c[1] for c in cells], days)
+        )
+        rows = cur.rowcount
+        cur.execute("INSERT INTO india_aqi_cells SELECT lat, lon, MAX(dt) FROM india_aqi GROUP BY lat, lon")
+        rollups.apply(cur, "india_aqi")
+        cur.execute("ANALYZE india_aqi")
+    return cells, rows
+
+
+def _text_bytes(rows):
+    return sum(len(str(v)) for row in rows for v in row if v is not None)
+
+
+def python_summary(cur, cells, since):
+    """The previous path: fetch the rows, build per-field lists, aggregate in NumPy."""
+    cur.execute(
+        """
+        SELECT lat AS latitude, lon AS longitude, aqi, pm25, pm10, co, no2, so2, o3, dt AS timestamp
+        FROM india_aqi
+        WHERE (lat, lon) IN (SELECT * FROM unnest(%s::float8[], %s::float8[])) AND dt >= %s
+        ORDER BY dt
+        """,
+        ([c[0] for c in cells], [c[1] for c in cells], since)
+    )
+    rows = cur.fetchall()
+    dicts = rows_to_dicts(cur, rows)
+    stats = {m: compute_basic_stats([r.get(m) for r in dicts]) for m in METRICS}
+    return len(rows), _text_bytes(rows), stats
+
+
+def sql_summary(cur, cells, since):
+    _, stats = summary_stats(cur, [(la, lo, 0.0, 1.0 / len(cells)) for la, lo in cells], since)
+    return 1, _text_bytes([[v for s in stats.values() for v in s.values()]]), stats
+
+
+def rollup_summary(cur, cells, since):
+    _, stats = rollups.totals(cur, cells, since, "daily")
+    return 1, _text_bytes([[v for s in stats.values() for v in s.values()]]), stats
+
+
+METHODS = {"python": python_summary, "sql": sql_summary, "rollup": rollup_summary}
+
+
+def run(method, cells, since, repeats):
+    timings = []
+    for _ in range(repeats):
+        with db_cursor() as cur:
+            cur.execute(f"SET LOCAL search_path = {SCHEMA}, public")
+            started = time.perf_counter()
+            rows, size, stats = METHODS[method](cur, cells, since)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings), rows, size, stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=[30, 365])
+    ap.add_argument("--cells", type=int, default=3, help="cells per side of the seeded block")
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    try:
+        cells, seeded = seed(args.cells, max(args.days))
+        print(f"seeded {seeded} rows for {len(cells)} cells")
+        print(f"{'days':>5} {'method':>8} {'median ms':>10} {'rows':>8} {'~bytes':>10} {'aqi mean':>9} {'aqi median':>11}")
+        for days in args.days:
+            since = datetime.utcnow() - timedelta(days=days)
+            for method in METHODS:
+                secs, rows, size, stats = run(method, cells, since, args.repeats)
+                aqi = stats["aqi"]
+                print(f"{days:>5} {method:>8} {secs * 1000:>10.1f} {rows:>8} {size:>10} "
+                      f"{aqi['mean']:>9.2f} {aqi['median']:>11.2f}")
+    finally:
+        with db_cursor(commit=True) as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
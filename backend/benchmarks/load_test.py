@@ -0,0 +1,104 @@
+# backend/benchmarks/load_test.py
+# Concurrency load test of /aqi/coords (or /aqi/location) against local stubs.
+#
+# Starts the stub upstreams, launches one uvicorn worker pointed at them and
+# fires --requests lookups with --concurrency in flight. Coordinates are
+# spread out so most lookups miss the OpenWeather cache. DATABASE_URL is
+# used as configured (the live path writes to air_quality).
+#
+# Run from backend/:
+#   python -m benchmarks.load_test --concurrency 200 --requests 2000 --latency-ms 300
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+
+async def wait_ready(client, base, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base}/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("app did not start")
+
+
+async def run(args):
+    # Stubs run in their own process so they don't compete with the client for the GIL
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--port", str(args.stub_port),
+         "--latency-ms", str(args.latency_ms)],
+        stdout=subprocess.DEVNULL,
+    )
+    stub_base = f"http://127.0.0.1:{args.stub_port}"
+    env = {
+        **os.environ,
+        "OWM_API_KEY": os.getenv("OWM_API_KEY", "stub"),
+        "OWM_BASE_URL": f"{stub_base}/data/2.5",
+        "NOMINATIM_URL": f"{stub_base}/search",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    rng = random.Random(0)
+    latencies = []
+    statuses = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            await wait_ready(client, base)
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one(i):
+                if args.endpoint == "location":
+                    url, params = f"{base}/aqi/location", {"place": f"place-{i % 500}"}
+                else:
+                    url, params = f"{base}/aqi/coords", {"lat": rng.uniform(8, 34), "lon": rng.uniform(70, 92)}
+                async with sem:
+                    t = time.perf_counter()
+                    try:
+                        r = await client.get(url, params=params)
+                        key = r.status_code
+                    except httpx.HTTPError as e:
+                        key = type(e).__name__
+                    latencies.append(time.perf_counter() - t)
+                    statuses[key] = statuses.get(key, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        for proc in (app, stub):
+            proc.terminate()
+            proc.wait()
+
+    ms = np.array(latencies) * 1000
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency_ms} ms")
+    print(f"throughput {args.requests / elapsed:,.1f} req/s  statuses {statuses}")
+    print(f"latency ms  p50 {np.percentile(ms, 50):.1f}  p95 {np.percentile(ms, 95):.1f}  "
+          f"p99 {np.percentile(ms, 99):.1f}  max {ms.max():.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--endpoint", choices=("coords", "location"), default="coords")
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--stub-port", type=int, default=8766)
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
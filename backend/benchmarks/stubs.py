@@ -0,0 +1,107 @@
+# backend/benchmarks/stubs.py
+# Local stand-ins for OpenWeather air_pollution (current, history and
+# forecast) and Nominatim search, used by the load test and for exercising
+# sweeps without touching the real APIs:
+#
+#   python -m benchmarks.stubs --port 8001 --latency-ms 200
+#   OWM_BASE_URL=http://127.0.0.1:8001/data/2.5 python fetch_india_aqi.py
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _reading(lat, lon, dt):
+    rnd = random.Random(f"{lat:.2f},{lon:.2f},{dt}")
+    return {
+        "dt": dt,
+        "main": {"aqi": rnd.randint(1, 5)},
+        "components": {
+            "pm2_5": round(rnd.uniform(5, 180), 2),
+            "pm10": round(rnd.uniform(10, 300), 2),
+            "no2": round(rnd.uniform(1, 80), 2),
+            "so2": round(rnd.uniform(1, 40), 2),
+            "o3": round(rnd.uniform(10, 120), 2),
+            "co": round(rnd.uniform(200, 3000), 2),
+        },
+    }
+
+
+def air_pollution_payload(lat, lon, dt=None):
+    return {"coord": {"lat": lat, "lon": lon},
+            "list": [_reading(lat, lon, int(dt or time.time()) // 3600 * 3600)]}
+
+
+def series_payload(lat, lon, start, end):
+    """Hourly readings on the hour in [start, end], like history/forecast."""
+    first = (int(start) + 3599) // 3600 * 3600
+    return {"coord": {"lat": lat, "lon": lon},
+            "list": [_reading(lat, lon, t) for t in range(first, int(end) + 1, 3600)]}
+
+
+def make_handler(latency_s=0.0, error_rate=0.0):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if latency_s:
+                time.sleep(latency_s)
+            if error_rate and random.random() < error_rate:
+                return self._send(503, {"cod": 503, "message": "stub error"})
+            url = urlparse(self.path)
+            qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path.endswith("/air_pollution/history"):
+                return self._send(200, series_payload(float(qs["lat"]), float(qs["lon"]),
+                                                      int(qs["start"]), int(qs["end"])))
+            if url.path.endswith("/air_pollution/forecast"):
+                now = int(time.time()) // 3600 * 3600
+                return self._send(200, series_payload(float(qs["lat"]), float(qs["lon"]), now, now + 96 * 3600))
+            if url.path.endswith("/air_pollution"):
+                return self._send(200, air_pollution_payload(float(qs["lat"]), float(qs["lon"])))
+            if url.path.endswith("/search"):
+                rnd = random.Random(qs.get("q", ""))
+                return self._send(200, [{"lat": str(rnd.uniform(8, 34)), "lon": str(rnd.uniform(70, 92)),
+                                         "display_name": qs.get("q", "")}])
+            self._send(404, {"cod": 404})
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the load test opens hundreds of connections at once
+
+
+def start(port=0, latency_ms=0.0, error_rate=0.0):
+    """Serve the stubs on a daemon thread; returns the server (server.server_port)."""
+    server = StubServer(("127.0.0.1", port), make_handler(latency_ms / 1000.0, error_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    start(args.port, args.latency_ms, args.error_rate)
+    print(f"Stub OpenWeather: http://127.0.0.1:{args.port}/data/2.5/air_pollution")
+    print(f"Stub Nominatim:   http://127.0.0.1:{args.port}/search")
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,75 @@
+# backend/bulk_load.py
+# COPY-based bulk loading.
+#
+# Rows are streamed with COPY into a session-local staging table shaped
+# like the target, then merged with INSERT ... SELECT ... ON CONFLICT DO
+# NOTHING in the same transaction. The merge's rowcount is the exact
+# number of new rows; everything else was already present (or repeated
+# within the batch).
+import io
+from datetime import date, datetime
+
+COPY_NULL = "\\N"
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(v):
+    if v is None:
+        return COPY_NULL
+    if isinstance(v, float):
+        return COPY_NULL if v != v else repr(v)   # NaN → NULL
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return str(v).translate(_ESCAPES)
+
+
+def copy_buffer(rows):
+    """COPY text-format buffer for an iterable of tuples."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+def copy_rows(cur, table, columns, rows):
+    """Plain COPY of rows into table (no conflict handling)."""
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", copy_buffer(rows))
+    return cur.rowcount
+
+
+def _temp_like(cur, name, table):
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+    cur.execute(f"TRUNCATE {name}")
+
+
+def copy_merge(cur, table, columns, conflict, rows, update=None, inserted_into=None):
+    """
+    COPY rows into a staging copy of `table`, then insert the ones that
+    don't conflict on `conflict` (a column list). Returns (inserted, skipped).
+    With `update` (a column list) conflicting rows overwrite those columns
+    instead, and "inserted" counts inserted + updated rows.
+    With `inserted_into` (a temp table name) the rows actually written are
+    also kept there, for follow-up statements in the same transaction.
+    Must run inside a transaction; the staging tables are emptied on commit.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0, 0
+    stage = f"{table}_stage"
+    cols = ", ".join(columns)
+    _temp_like(cur, stage, table)
+    copy_rows(cur, stage, columns, rows)
+    action = "DO NOTHING"
+    if update:
+        action = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update)
+    merge = (f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} "
+             f"ON CONFLICT ({', '.join(conflict)}) {action}")
+    if inserted_into:
+        _temp_like(cur, inserted_into, table)
+        merge = (f"WITH merged AS ({merge} RETURNING {cols}) "
+                 f"INSERT INTO {inserted_into} ({cols}) SELECT {cols} FROM merged")
+    cur.execute(merge)
+    inserted = cur.rowcount
+    return inserted, len(rows) - inserted
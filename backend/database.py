@@ -1,75 +1,268 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.pool
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
+import rollups
 
 load_dotenv()
 
 # How many days of data to keep (older records are auto-deleted)
 DATA_RETENTION_DAYS = 30
 
-def get_connection():
+# Connection pool settings (shared by every module in the process)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))          # seconds to wait for a free connection
+DB_HEALTHCHECK_IDLE = float(os.getenv("DB_HEALTHCHECK_IDLE", "30"))  # ping connections idle longer than this
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no timeout
+
+
+def _connect_params():
     """
     Connect using DATABASE_URL (Render provides this automatically)
     or fall back to individual env vars / defaults for local dev.
     """
+    params = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        params["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
     database_url = os.getenv("DATABASE_URL")
-    
     if database_url:
-        print(f"[DB] Connecting via DATABASE_URL...")
-        try:
-            conn = psycopg2.connect(database_url)
-            print("[DB] ✓ Database connection successful")
-            return conn
-        except Exception as e:
-            print(f"[DB ERROR] Failed to connect via DATABASE_URL: {e}")
-            raise
-    
+        params["dsn"] = database_url
+        return params
+
     # Fallback for local dev only
-    print(f"[DB] WARNING: No DATABASE_URL found. Attempting localhost fallback...")
+    params.update(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+        database=os.getenv("DB_NAME", "postgres"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASS", "Admin@123"),
+    )
+    return params
+
+
+def get_connection():
+    """
+    Open a dedicated (unpooled) connection. Request paths should use
+    db_connection() / db_cursor() instead; this is for long-lived sessions.
+    """
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=int(os.getenv("DB_PORT", "5432")),
-            database=os.getenv("DB_NAME", "postgres"),
-            user=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASS", "Admin@123")
-        )
-        print("[DB] ✓ Localhost connection successful (local dev mode)")
-        return conn
+        return psycopg2.connect(**_connect_params())
     except Exception as e:
-        print(f"[DB ERROR] Failed to connect to localhost: {e}")
+        print(f"[DB ERROR] Failed to connect: {e}")
         raise
 
 
+class PoolTimeout(Exception):
+    """No pooled connection became free within DB_POOL_TIMEOUT."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool with blocking checkout, idle health checks
+    and usage counters. psycopg2's ThreadedConnectionPool raises as soon as
+    it is exhausted, so a semaphore sized to maxconn provides the waiting.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_idle=DB_HEALTHCHECK_IDLE):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **_connect_params())
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "timeouts": 0,
+            "healthcheck_failures": 0,
+            "in_use": 0,
+        }
+
+    def _acquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return
+        started = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["wait_time_ms"] += waited_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+            if not acquired:
+                self._stats["timeouts"] += 1
+        if not acquired:
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_idle:
+            return True  # freshly opened or recently used
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        # Discard stale idle connections until a healthy (or brand new) one turns up
+        for _ in range(self.maxconn):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._stats["healthcheck_failures"] += 1
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        return self._pool.getconn()
+
+    def _release(self, conn):
+        broken = bool(conn.closed)
+        if not broken and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=broken)
+
+    @contextmanager
+    def connection(self):
+        self._acquire_slot()
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+        try:
+            yield conn
+        finally:
+            try:
+                self._release(conn)
+            finally:
+                with self._lock:
+                    self._stats["in_use"] -= 1
+                self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+        out["wait_time_ms"] = round(out["wait_time_ms"], 2)
+        out["max_wait_ms"] = round(out["max_wait_ms"], 2)
+        out["min_size"] = self.minconn
+        out["max_size"] = self.maxconn
+        return out
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, created lazily on first checkout."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                print(f"[DB] ✓ Connection pool ready (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+    return _pool
+
+
+@contextmanager
+def db_connection():
+    """Check out a pooled connection; it is rolled back if left mid-transaction."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def db_cursor(commit=False):
+    """Pooled cursor; commits on success when `commit` is set."""
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        finally:
+            cur.close()
+
+
+def pool_stats():
+    if _pool is None:
+        return {"initialized": False}
+    return {"initialized": True, **_pool.stats()}
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def cleanup_old_records():
     """
-    Delete records older than DATA_RETENTION_DAYS from both
-    air_quality and india_aqi tables.
+    Drop records older than DATA_RETENTION_DAYS from both
+    air_quality and india_aqi tables: whole time partitions are
+    detached and dropped (see partitions.py), so a partition's rows
+    go once all of them have expired.
     This keeps the database small and efficient.
     """
+    import partitions   # imports this module
+
     cutoff = datetime.now(timezone.utc) - timedelta(days=DATA_RETENTION_DAYS)
     try:
-        conn = get_connection()
-        cur = conn.cursor()
+        partitions.ensure_all()
+        with db_cursor(commit=True) as cur:
+            naive_cutoff = cutoff.replace(tzinfo=None)
+            # Clean air_quality table (user search results)
+            parts_aq, deleted_aq = partitions.drop_expired(cur, "air_quality", naive_cutoff)
+
+            # Clean india_aqi table (scheduled India data)
+            parts_india, deleted_india = partitions.drop_expired(cur, "india_aqi", naive_cutoff)
 
-        # Clean air_quality table (user search results)
-        cur.execute(
-            "DELETE FROM air_quality WHERE timestamp < %s", (cutoff,)
-        )
-        deleted_aq = cur.rowcount
+            # Forget grid cells that no longer have any rows
+            cur.execute(
+                "DELETE FROM india_aqi_cells WHERE latest_dt < %s", (cutoff,)
+            )
 
-        # Clean india_aqi table (scheduled India data)
-        cur.execute(
-            "DELETE FROM india_aqi WHERE dt < %s", (cutoff,)
-        )
-        deleted_india = cur.rowcount
+            # Rollups have their own (longer) retention
+            pruned = rollups.prune(cur)
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Forecast hours that are already in the past
+            cur.execute(
+                "DELETE FROM india_aqi_forecast WHERE dt < %s", (datetime.now(timezone.utc) - timedelta(days=1),)
+            )
 
-        print(f"[CLEANUP] Deleted {deleted_aq} rows from air_quality, "
-              f"{deleted_india} rows from india_aqi (older than {DATA_RETENTION_DAYS} days)")
+        print(f"[CLEANUP] Dropped {parts_aq} partitions (+{deleted_aq} rows) from air_quality, "
+              f"{parts_india} partitions (+{deleted_india} rows) from india_aqi "
+              f"(older than {DATA_RETENTION_DAYS} days), "
+              f"{pruned['hourly']} hourly / {pruned['daily']} daily rollup rows")
     except Exception as e:
         print(f"[CLEANUP ERROR] {e}")
@@ -1,75 +1,102 @@
 # backend/fetch_india_aqi.py
 import os
 import time
+import random
+import numpy as np
 import requests
-import psycopg2
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from aqi_utils import compute_aqi_for_row
+from requests.adapters import HTTPAdapter
+from aqi_utils import compute_aqi_batch, compute_aqi_for_row
+import grid_snapshot
+import india_grid
+import partitions
+import rollups
+import sweep_progress
+from bulk_load import copy_merge
+from database import db_cursor
+from owm_cache import fetch_air_pollution, fetch_air_pollution_series
+from spatial import upsert_india_cells
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
 OPENWEATHER_KEY = os.getenv("OWM_API_KEY")
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# Fallback for local dev (if DATABASE_URL not available)
-if not DATABASE_URL:
-    DATABASE_URL = f"postgresql://{os.getenv('DB_USER', 'postgres')}:{os.getenv('DB_PASS', '')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'postgres')}"
 
 if not OPENWEATHER_KEY:
     raise RuntimeError("OWM_API_KEY not found in .env")
 
-LAT_START, LAT_END = 6, 38
-LON_START, LON_END = 68, 98
-STEP = 1.0   # 1 degree grid (fast, safe)
+# Sweep engine tuning. The OpenWeather free tier allows 60 calls/minute,
+# so the default rate is 1 request/second; raise it for paid plans.
+SWEEP_RATE = float(os.getenv("INDIA_SWEEP_RATE", "1.0"))       # requests per second
+SWEEP_BURST = float(os.getenv("INDIA_SWEEP_BURST", "1"))        # token bucket capacity
+SWEEP_WORKERS = int(os.getenv("INDIA_SWEEP_WORKERS", "8"))      # concurrent requests in flight
+SWEEP_RETRIES = int(os.getenv("INDIA_SWEEP_RETRIES", "3"))      # retries per point
+SWEEP_BACKOFF = float(os.getenv("INDIA_SWEEP_BACKOFF", "2.0"))  # base backoff seconds
 
-def frange(start, stop, step):
-    v = start
-    while v <= stop:
-        yield round(v, 3)
-        v += step
+# What each point's call fetches:
+#   current  - the latest air_pollution reading (one row per point)
+#   history  - air_pollution/history from just after the cell's newest stored
+#              reading (at most HISTORY_DAYS back) to now: hourly rows that
+#              close the gap since the last sweep in one call
+#   backfill - air_pollution/history over the whole HISTORY_DAYS window;
+#              hours already stored are skipped by the merge
+# SWEEP_FORECAST adds one air_pollution/forecast call per point, stored in
+# india_aqi_forecast.
+SWEEP_MODE = os.getenv("INDIA_SWEEP_MODE", "current")
+SWEEP_MODES = ("current", "history", "backfill")
+SWEEP_FORECAST = os.getenv("INDIA_SWEEP_FORECAST", "0") not in ("0", "false", "no")
+HISTORY_DAYS = float(os.getenv("INDIA_HISTORY_DAYS", "7"))
 
-def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+INDIA_AQI_COLUMNS = ("lat", "lon", "dt", "pm25", "pm10", "no2", "so2", "o3", "co", "aqi")
 
 def save_row(row):
     """Single row insert — used only for fallback/individual saves."""
-    conn = get_conn()
-    cur = conn.cursor()
-    query = """
-    INSERT INTO india_aqi(lat, lon, dt, pm25, pm10, no2, so2, o3, co, aqi)
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    ON CONFLICT (lat, lon, dt) DO NOTHING;
+    with db_cursor(commit=True) as cur:
+        merge_rows(cur, [row])
+
+def merge_rows(cur, rows):
     """
-    cur.execute(query, row)
-    conn.commit()
-    cur.close()
-    conn.close()
+    COPY rows into a staging table and merge them, rolling the new ones up
+    into the hourly/daily tables; returns (inserted, skipped).
+    """
+    inserted, skipped = copy_merge(cur, "india_aqi", INDIA_AQI_COLUMNS, ("lat", "lon", "dt"), rows,
+                                   inserted_into="india_aqi_new")
+    if inserted:
+        rollups.apply(cur, "india_aqi_new")
+    upsert_india_cells(cur, rows)
+    return inserted, skipped
+
+def merge_forecast_rows(cur, rows):
+    """Upsert forecast rows; newer forecasts replace older ones for the same hour."""
+    return copy_merge(cur, "india_aqi_forecast", INDIA_AQI_COLUMNS, ("lat", "lon", "dt"), rows,
+                      update=INDIA_AQI_COLUMNS[3:] + ("issued_at",))
 
 def save_rows_batch(rows):
-    """Batch insert all rows using a single DB connection — much faster across platforms."""
-    if not rows:
-        return 0
-    query = """
-    INSERT INTO india_aqi(lat, lon, dt, pm25, pm10, no2, so2, o3, co, aqi)
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    ON CONFLICT (lat, lon, dt) DO NOTHING;
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.executemany(query, rows)
-    conn.commit()
-    saved = cur.rowcount if cur.rowcount != -1 else len(rows)
-    cur.close()
-    conn.close()
-    print(f"[DB] Batch inserted {len(rows)} rows in a single connection.")
-    return saved
-
-def fetch_point(lat, lon):
-    url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={OPENWEATHER_KEY}"
-    r = requests.get(url, timeout=8)
-    r.raise_for_status()
-    js = r.json()
+    Bulk load sweep rows: COPY into a staging table, merge with ON CONFLICT
+    DO NOTHING. Returns (inserted, skipped) with exact counts.
+    """
+    if not rows:
+        return 0, 0
+    started = time.monotonic()
+    with db_cursor(commit=True) as cur:
+        inserted, skipped = merge_rows(cur, rows)
+    print(f"[DB] Bulk loaded {len(rows)} rows: {inserted} inserted, {skipped} skipped "
+          f"in {time.monotonic() - started:.2f}s")
+    return inserted, skipped
+
+def make_session(pool_size=SWEEP_WORKERS):
+    """Shared HTTP session so sweep workers reuse keep-alive connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_point(lat, lon, session=None, base_url=None, limiter=None):
+    js, _ = fetch_air_pollution(lat, lon, session=session, timeout=8, base_url=base_url, limiter=limiter)
     item = js["list"][0]
     dt = datetime.utcfromtimestamp(item["dt"])
     comp = item["components"]
@@ -87,26 +114,212 @@ def fetch_point(lat, lon):
             conc["so2"], conc["o3"], conc["co"],
             aqi_map["aqi"])
 
-def run_india_update():
-    print("Starting India update:", datetime.utcnow().isoformat())
-    rows = []    # collect all rows first
-    errors = 0
+def _is_retryable(exc):
+    """Network errors, timeouts, 429 and 5xx are worth retrying; other 4xx are not."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
 
-    for lat in frange(LAT_START, LAT_END, STEP):
-        for lon in frange(LON_START, LON_END, STEP):
+def _retry_delay(exc, attempt, backoff):
+    """Honour Retry-After on 429, otherwise exponential backoff with jitter."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        retry_after = exc.response.headers.get("Retry-After")
+        if retry_after:
             try:
-                row = fetch_point(lat, lon)
-                rows.append(row)
-                print(f"Fetched {lat},{lon}")
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+def parse_series(lat, lon, js):
+    """
+    Rows for every hourly reading in a history/forecast payload, with AQI
+    computed column-wise. Readings with no usable pollutant are dropped.
+    """
+    items = js.get("list") or []
+    if not items:
+        return []
+
+    def col(key):
+        return np.array([it.get("components", {}).get(key) for it in items], dtype=float)
+
+    conc = {"pm25": col("pm2_5"), "pm10": col("pm10"), "no2": col("no2"),
+            "so2": col("so2"), "o3": col("o3"), "co": col("co") / 1000.0}
+    aqi = compute_aqi_batch(conc)["aqi"]
+    names = ("pm25", "pm10", "no2", "so2", "o3", "co")
+    rows = []
+    for i, it in enumerate(items):
+        if np.isnan(aqi[i]):
+            continue
+        vals = [None if np.isnan(conc[n][i]) else float(conc[n][i]) for n in names]
+        rows.append((lat, lon, datetime.utcfromtimestamp(it["dt"]), *vals, int(aqi[i])))
+    return rows
+
+def with_retry(call, limiter, retries=SWEEP_RETRIES, backoff=SWEEP_BACKOFF):
+    """
+    call() gated by the shared rate limiter, retried with backoff. Pass
+    limiter=None when call() acquires it itself (only on a cache miss).
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= retries or not _is_retryable(e):
+                raise
+            time.sleep(_retry_delay(e, attempt, backoff))
+            attempt += 1
+
+def fetch_point_with_retry(lat, lon, session, limiter, retries=SWEEP_RETRIES,
+                           backoff=SWEEP_BACKOFF, base_url=None):
+    """fetch_point retried with backoff; the limiter gates only cache misses."""
+    return with_retry(lambda: fetch_point(lat, lon, session=session, base_url=base_url, limiter=limiter),
+                      None, retries, backoff)
+
+def history_fetcher(mode=SWEEP_MODE, forecast=SWEEP_FORECAST, history_days=HISTORY_DAYS):
+    """
+    Point fetcher for sweep_points returning (rows, forecast_rows) from the
+    history/forecast endpoints; see SWEEP_MODE.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    floor = now - timedelta(days=history_days)
+    latest = {}
+    if mode == "history":
+        with db_cursor() as cur:
+            cur.execute("SELECT lat, lon, latest_dt FROM india_aqi_cells")
+            latest = {(r[0], r[1]): r[2] for r in cur.fetchall()}
+
+    def fetch(lat, lon, session, limiter, retries, backoff, base_url):
+        rows, fc = [], []
+        start = floor
+        if mode == "history" and (lat, lon) in latest:
+            start = max(floor, latest[(lat, lon)] + timedelta(hours=1))
+        if mode in ("history", "backfill") and start < now:
+            js = with_retry(lambda: fetch_air_pollution_series(
+                "history", lat, lon, start.replace(tzinfo=timezone.utc).timestamp(),
+                now.replace(tzinfo=timezone.utc).timestamp(), session=session, base_url=base_url),
+                limiter, retries, backoff)
+            rows = parse_series(lat, lon, js)
+        elif mode == "current":
+            rows = [fetch_point_with_retry(lat, lon, session, limiter, retries, backoff, base_url)]
+        if forecast:
+            js = with_retry(lambda: fetch_air_pollution_series(
+                "forecast", lat, lon, session=session, base_url=base_url), limiter, retries, backoff)
+            fc = [r for r in parse_series(lat, lon, js) if r[2] > now]
+        return rows, fc
+
+    return fetch
+
+def grid_points():
+    """Sweep points from the grid definition (see india_grid); built once and cached."""
+    return india_grid.points()
+
+def sweep_points(points, rate=None, burst=None, workers=None, retries=None,
+                 backoff=None, base_url=None, on_result=None, fetch=None):
+    """
+    Fetch every (lat, lon) in `points` concurrently over one HTTP session.
+    A token bucket keeps the aggregate request rate at `rate` req/s no matter
+    how many workers are in flight. Returns (rows, errors).
+
+    With on_result, each outcome is handed to on_result(lat, lon, row) as it
+    arrives (row None on failure) instead of being collected, and rows is [].
+    `fetch` replaces fetch_point_with_retry (same signature); its results
+    are passed through as the "row".
+    """
+    rate = rate or SWEEP_RATE
+    workers = workers or SWEEP_WORKERS
+    retries = SWEEP_RETRIES if retries is None else retries
+    backoff = SWEEP_BACKOFF if backoff is None else backoff
+    limiter = TokenBucket(rate, burst if burst is not None else SWEEP_BURST)
+    fetch = fetch or fetch_point_with_retry
+    session = make_session(workers)
+
+    rows = []
+    errors = 0
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="india-sweep")
+    try:
+        futures = {
+            pool.submit(fetch, lat, lon, session, limiter,
+                        retries, backoff, base_url): (lat, lon)
+            for lat, lon in points
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            lat, lon = futures[fut]
+            try:
+                row = fut.result()
             except Exception as e:
                 print("Error at", lat, lon, "->", e)
                 errors += 1
-            time.sleep(1)  # safe spacing for API rate limits
+                row = None
+            if on_result is not None:
+                on_result(lat, lon, row)
+            elif row is not None:
+                rows.append(row)
+            if done % 100 == 0:
+                print(f"Fetched {done}/{len(points)} points ({errors} errors)")
+    finally:
+        # on interruption, drop queued points instead of fetching them all first
+        pool.shutdown(wait=False, cancel_futures=True)
+        session.close()
+    return rows, errors
+
+def run_india_update(rate=None, workers=None, mode=None, forecast=None):
+    """
+    Sweep the grid, flushing rows in chunks as they arrive. An interrupted
+    sweep is resumed: points it already stored are not fetched again.
+    Returns the sweep's stats (None if another process is mid-sweep).
+    """
+    mode = mode or SWEEP_MODE
+    forecast = SWEEP_FORECAST if forecast is None else forecast
+    if mode not in SWEEP_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(SWEEP_MODES)}")
+    print("Starting India update:", datetime.utcnow().isoformat(), f"(mode={mode}, forecast={forecast})")
+    started = time.monotonic()
+    # history modes write past hours: have their partitions ready too
+    partitions.ensure_all(tables=("india_aqi",), back_days=1 if mode == "current" else HISTORY_DAYS)
+    points = grid_points()
+    try:
+        sweep_id, completed, resumed = sweep_progress.begin(len(points))
+    except sweep_progress.SweepInProgress as e:
+        print(f"[SWEEP] Skipped: {e}")
+        return None
+    todo = [p for p in points if p not in completed]
+    if resumed:
+        print(f"[SWEEP {sweep_id}] Resuming: {len(completed)} points already stored, {len(todo)} to go")
+
+    recorder = sweep_progress.SweepRecorder(sweep_id, merge_rows, merge_forecast_rows)
+    if mode == "current" and not forecast:
+        fetch = None
+
+        def on_result(lat, lon, row):
+            recorder.add(lat, lon, None if row is None else [row])
+    else:
+        fetch = history_fetcher(mode, forecast)
+
+        def on_result(lat, lon, res):
+            rows, fc = res if res is not None else (None, None)
+            recorder.add(lat, lon, rows, fc)
+    try:
+        sweep_points(todo, rate=rate, workers=workers, on_result=on_result, fetch=fetch)
+        recorder.finish()
+    except BaseException:
+        recorder.interrupt()
+        raise
 
-    # One single DB connection for all rows
-    print(f"Fetch complete. {len(rows)} rows fetched, {errors} errors. Saving to DB...")
-    save_rows_batch(rows)
-    print(f"Finished. Total saved: {len(rows)}")
+    stats = dict(recorder.stats, sweep_id=sweep_id, resumed=resumed, mode=mode,
+                 seconds=round(time.monotonic() - started, 1))
+    print(f"[SWEEP {sweep_id}] Finished: {stats['ok']} ok, {stats['failed']} failed, "
+          f"{stats['inserted']} rows inserted ({stats['skipped']} already present) in {stats['seconds']}s")
+
+    # Publish the new sweep to in-process readers
+    try:
+        grid_snapshot.refresh()
+    except Exception as e:
+        print(f"[SNAPSHOT ERROR] {e}")
+    return stats
 
 
 # -------------------------------------------------------------------
@@ -120,22 +333,15 @@ def get_india_aqi(lat, lon):
     except Exception as e:
         print("⚠️ Live API failed, using fallback DB:", e)
 
-        conn = get_conn()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT lat, lon, dt, pm25, pm10, no2, so2, o3, co, aqi
-            FROM india_aqi
-            WHERE lat = %s AND lon = %s
-            ORDER BY dt DESC
-            LIMIT 1;
-        """, (lat, lon))
-
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-
-        return row
+        with db_cursor() as cur:
+            cur.execute("""
+                SELECT lat, lon, dt, pm25, pm10, no2, so2, o3, co, aqi
+                FROM india_aqi
+                WHERE lat = %s AND lon = %s
+                ORDER BY dt DESC
+                LIMIT 1;
+            """, (lat, lon))
+            return cur.fetchone()
 
 
 if __name__ == "__main__":
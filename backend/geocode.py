@@ -0,0 +1,219 @@
+# backend/geocode.py
+# Place-name → coordinates for /aqi/location, with Nominatim as last resort.
+#
+# Lookups go through, in order:
+#   1. the offline India gazetteer (data/india_gazetteer.csv), no I/O at all
+#   2. an in-process TTL + LRU map
+#   3. the geocode_cache table (shared by workers, survives restarts)
+#   4. Nominatim, rate limited to NOMINATIM_MIN_INTERVAL and single-flight
+#      per query key; the answer (including "not found") is written back.
+import asyncio
+import csv
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from database import db_cursor
+import async_support
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))   # usage policy: 1 req/s
+GEOCODE_TTL = float(os.getenv("GEOCODE_TTL_DAYS", "30")) * 86400
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", "6")) * 3600
+GEOCODE_MEMORY_ENTRIES = int(os.getenv("GEOCODE_MEMORY_ENTRIES", "2000"))
+GEOCODE_GAZETTEER = os.getenv("GEOCODE_GAZETTEER", "1") not in ("0", "false", "no")
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "india_gazetteer.csv"
+
+HEADERS = {"User-Agent": "AQI-Insight-App"}
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+
+def query_key(place, country):
+    return f"{normalize(place)}|{normalize(country)}"
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    """{normalized name or alias: (lat, lon, display_name, normalized state)}"""
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            entry = (float(row["lat"]), float(row["lon"]),
+                     f"{row['name']}, {row['state']}, India", normalize(row["state"]))
+            for name in [row["name"]] + (row["aliases"] or "").split("|"):
+                if normalize(name):
+                    out.setdefault(normalize(name), entry)
+    return out
+
+
+class GeocodeCache:
+    """Layered geocoder; resolve() returns {lat, lon, display_name, source} or None."""
+
+    def __init__(self, gazetteer=None):
+        self.gazetteer = gazetteer or {}
+        self._memory = OrderedDict()    # key -> (expires_at, result or None)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._net_lock = None
+        self._last_request = 0.0
+        self._stats = {"gazetteer": 0, "memory": 0, "db": 0, "nominatim": 0,
+                       "coalesced": 0, "not_found": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def from_gazetteer(self, place, country):
+        if normalize(country) not in ("india", "in", "bharat"):
+            return None
+        name = normalize(place)
+        hit = self.gazetteer.get(name)
+        if hit is None and "," in place:
+            # "Pune, Maharashtra" → Pune, if the rest names its state
+            head, _, rest = place.partition(",")
+            hit = self.gazetteer.get(normalize(head))
+            if hit is not None and normalize(rest) not in ("", hit[3], "india"):
+                hit = None
+        if hit is None:
+            return None
+        return {"lat": hit[0], "lon": hit[1], "display_name": hit[2]}
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._memory[key]
+                return False, None
+            self._memory.move_to_end(key)
+            return True, entry[1]
+
+    def _memory_put(self, key, result):
+        ttl = GEOCODE_TTL if result else GEOCODE_NEGATIVE_TTL
+        with self._lock:
+            self._memory[key] = (time.monotonic() + ttl, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > GEOCODE_MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _db_get(self, key):
+        with db_cursor() as cur:
+            cur.execute(
+                "SELECT lat, lon, display_name, fetched_at FROM geocode_cache WHERE query_key = %s",
+                (key,)
+            )
+            row = cur.fetchone()
+        if not row:
+            return False, None
+        found = row[0] is not None
+        ttl = GEOCODE_TTL if found else GEOCODE_NEGATIVE_TTL
+        if row[3] < datetime.now(timezone.utc) - timedelta(seconds=ttl):
+            return False, None
+        return True, ({"lat": row[0], "lon": row[1], "display_name": row[2]} if found else None)
+
+    def _db_put(self, key, result):
+        with db_cursor(commit=True) as cur:
+            cur.execute(
+                """
+                INSERT INTO geocode_cache (query_key, lat, lon, display_name, fetched_at)
+                VALUES (%s, %s, %s, %s, now())
+                ON CONFLICT (query_key) DO UPDATE
+                SET lat = EXCLUDED.lat, lon = EXCLUDED.lon,
+                    display_name = EXCLUDED.display_name, fetched_at = EXCLUDED.fetched_at
+                """,
+                (key, result and result["lat"], result and result["lon"], result and result["display_name"])
+            )
+
+    async def _nominatim(self, place, country):
+        if self._net_lock is None:
+            self._net_lock = asyncio.Lock()
+        async with self._net_lock:
+            wait = self._last_request + NOMINATIM_MIN_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                resp = await async_support.get_http_client().get(
+                    NOMINATIM_URL,
+                    params={"q": f"{place}, {country}", "format": "json", "limit": 1},
+                    headers=HEADERS,
+                    timeout=8,
+                )
+            finally:
+                self._last_request = time.monotonic()
+        resp.raise_for_status()
+        geo = resp.json()
+        if not geo:
+            return None
+        return {"lat": float(geo[0]["lat"]), "lon": float(geo[0]["lon"]),
+                "display_name": geo[0].get("display_name")}
+
+    async def _load(self, key, place, country):
+        try:
+            found, result = await async_support.run_db(self._db_get, key)
+        except Exception as e:
+            print(f"[GEOCODE] cache read failed: {e}")
+            found, result = False, None
+        if found:
+            self._count("db")
+        else:
+            result = await self._nominatim(place, country)
+            self._count("nominatim")
+            try:
+                await async_support.run_db(self._db_put, key, result)
+            except Exception as e:
+                print(f"[GEOCODE] cache write failed: {e}")
+        self._memory_put(key, result)
+        return result, "db" if found else "nominatim"
+
+    def _load_done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._count("errors")
+
+    async def resolve(self, place, country="India"):
+        """Raises on Nominatim/network errors (never cached)."""
+        hit = self.from_gazetteer(place, country) if GEOCODE_GAZETTEER else None
+        if hit:
+            self._count("gazetteer")
+            return {**hit, "source": "gazetteer"}
+
+        key = query_key(place, country)
+        found, result = self._memory_get(key)
+        if found:
+            self._count("memory")
+            source = "memory"
+        else:
+            # The load runs as its own task, awaited shielded by every caller,
+            # so a cancelled caller doesn't cancel it for the others
+            task = self._inflight.get(key)
+            if task is not None:
+                self._count("coalesced")
+            else:
+                task = self._inflight[key] = asyncio.ensure_future(self._load(key, place, country))
+                task.add_done_callback(lambda t: self._load_done(key, t))
+            result, source = await asyncio.shield(task)
+
+        if result is None:
+            self._count("not_found")
+            return None
+        return {**result, "source": source}
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["memory_size"] = len(self._memory)
+        lookups = out["gazetteer"] + out["memory"] + out["db"] + out["nominatim"] + out["coalesced"]
+        out["lookups"] = lookups
+        out["hit_rate"] = round((lookups - out["nominatim"]) / lookups, 4) if lookups else None
+        out["gazetteer_entries"] = len(self.gazetteer)
+        return out
+
+
+GEOCODER = GeocodeCache(load_gazetteer() if GEOCODE_GAZETTEER else None)
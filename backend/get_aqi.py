@@ -1,23 +1,15 @@
 # backend/get_aqi.py
-import requests
-import psycopg2
 from dotenv import load_dotenv
-import os
 from aqi_utils import compute_aqi_for_row
+from database import db_cursor
+from owm_cache import fetch_air_pollution
 from datetime import datetime
 
 load_dotenv()
-OPENWEATHER_KEY = os.getenv("OWM_API_KEY")
-DB_HOST = os.getenv("DB_HOST","localhost")
-DB_PORT = os.getenv("DB_PORT","5432")
-DB_NAME = os.getenv("DB_NAME","postgres")
-DB_USER = os.getenv("DB_USER","postgres")
-DB_PASS = os.getenv("DB_PASS","")
 
 def global_api(lat, lon):
     try:
-        url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={OPENWEATHER_KEY}"
-        js = requests.get(url, timeout=5).json()
+        js, _ = fetch_air_pollution(lat, lon, timeout=5)
         comp = js["list"][0]["components"]
         conc = {
             "pm25": comp.get("pm2_5"),
@@ -32,12 +24,9 @@ def global_api(lat, lon):
         return None
 
 def india_fallback(lat, lon):
-    conn = psycopg2.connect(host=DB_HOST,port=DB_PORT,database=DB_NAME,user=DB_USER,password=DB_PASS)
-    cur = conn.cursor()
-    cur.execute("SELECT pm25,pm10,no2,so2,o3,co,aqi FROM india_aqi WHERE lat=%s AND lon=%s ORDER BY dt DESC LIMIT 1", (lat, lon))
-    r = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db_cursor() as cur:
+        cur.execute("SELECT pm25,pm10,no2,so2,o3,co,aqi FROM india_aqi WHERE lat=%s AND lon=%s ORDER BY dt DESC LIMIT 1", (lat, lon))
+        r = cur.fetchone()
     if not r:
         return None
     return {
@@ -0,0 +1,191 @@
+# backend/grid_snapshot.py
+# In-process, array-backed copy of the latest India sweep.
+#
+# Each grid cell's newest reading is held in NumPy arrays. A dense lookup
+# lattice maps every LATTICE_STEP cell inside the India box to the index of
+# its nearest sampled point, so a nearest-cell lookup is two array reads
+# with no database round trip.
+import os
+import select
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from scipy.spatial import cKDTree
+from database import db_cursor, get_connection
+from spatial import haversine_km, NEAREST_CELL_SEARCH_KM
+
+LATTICE_STEP = float(os.getenv("SNAPSHOT_LATTICE_STEP", "0.1"))   # degrees
+POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "60"))    # DB change poll interval
+SNAPSHOT_LISTEN = os.getenv("SNAPSHOT_LISTEN", "1") not in ("0", "false", "no")
+CHANNEL = "india_aqi_updated"   # NOTIFY channel; sweeps in other processes announce new data here
+FIELDS = ("pm25", "pm10", "no2", "so2", "o3", "co", "aqi")
+
+
+class GridSnapshot:
+    """Immutable snapshot; replaced wholesale on refresh."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = datetime.now(timezone.utc)
+        self.size = len(rows)
+
+        cols = list(zip(*rows)) if rows else [()] * 10
+        self.lats = np.asarray(cols[0], dtype=float)
+        self.lons = np.asarray(cols[1], dtype=float)
+        self.dts = list(cols[2])
+        self.values = {f: np.asarray(cols[3 + i], dtype=float) for i, f in enumerate(FIELDS)}
+        self.latest_dt = max(self.dts) if self.dts else None
+
+        self.lat0 = self.lon0 = 0.0
+        self.cell_index = np.zeros((0, 0), dtype=np.int32)
+        if self.size:
+            self._build_lattice()
+
+    def _build_lattice(self):
+        margin = 1.0
+        self.lat0 = float(self.lats.min()) - margin
+        self.lon0 = float(self.lons.min()) - margin
+        n_lat = int(np.ceil((self.lats.max() + margin - self.lat0) / LATTICE_STEP)) + 1
+        n_lon = int(np.ceil((self.lons.max() + margin - self.lon0) / LATTICE_STEP)) + 1
+
+        # Planar distance with longitude scaled at the mid latitude closely
+        # tracks great-circle distance between neighbouring cells.
+        kx = np.cos(np.radians(float(self.lats.mean())))
+        tree = cKDTree(np.column_stack([self.lats, self.lons * kx]))
+        glat = self.lat0 + np.arange(n_lat) * LATTICE_STEP
+        glon = self.lon0 + np.arange(n_lon) * LATTICE_STEP
+        mlat, mlon = np.meshgrid(glat, glon, indexing="ij")
+        _, idx = tree.query(np.column_stack([mlat.ravel(), mlon.ravel() * kx]))
+        self.cell_index = idx.astype(np.int32).reshape(n_lat, n_lon)
+
+    def nearest(self, lat, lon, max_km=NEAREST_CELL_SEARCH_KM[-1]):
+        """Index of the nearest sampled point, or None."""
+        if not self.size:
+            return None
+        i = int(round((lat - self.lat0) / LATTICE_STEP))
+        j = int(round((lon - self.lon0) / LATTICE_STEP))
+        i = min(max(i, 0), self.cell_index.shape[0] - 1)
+        j = min(max(j, 0), self.cell_index.shape[1] - 1)
+        k = int(self.cell_index[i, j])
+        if haversine_km(lat, lon, self.lats[k], self.lons[k]) > max_km:
+            return None
+        return k
+
+    def points_in_bbox(self, min_lat, max_lat, min_lon, max_lon):
+        """Indices of sampled points inside the box."""
+        if not self.size:
+            return np.zeros(0, dtype=np.int64)
+        mask = (self.lats >= min_lat) & (self.lats <= max_lat) & (self.lons >= min_lon) & (self.lons <= max_lon)
+        return np.flatnonzero(mask)
+
+    def record(self, k):
+        """Point k as a plain dict (None for missing values)."""
+        out = {"latitude": float(self.lats[k]), "longitude": float(self.lons[k])}
+        for f in FIELDS:
+            v = self.values[f][k]
+            out[f] = None if np.isnan(v) else (int(v) if f == "aqi" else float(v))
+        out["timestamp"] = self.dts[k]
+        return out
+
+    def info(self):
+        age = None
+        if self.latest_dt is not None:
+            latest = self.latest_dt.replace(tzinfo=timezone.utc) if self.latest_dt.tzinfo is None else self.latest_dt
+            age = round((datetime.now(timezone.utc) - latest).total_seconds(), 1)
+        return {
+            "version": self.version,
+            "cells": self.size,
+            "latest_dt": self.latest_dt.isoformat() if self.latest_dt else None,
+            "loaded_at": self.loaded_at.isoformat(),
+            "age_seconds": age,
+        }
+
+
+_snapshot = GridSnapshot(0, [])
+_refresh_lock = threading.Lock()
+_fingerprint = None
+
+
+def current():
+    return _snapshot
+
+
+def _db_fingerprint(cur):
+    cur.execute("SELECT MAX(latest_dt), COUNT(*) FROM india_aqi_cells")
+    return tuple(cur.fetchone())
+
+
+def refresh(force=True):
+    """
+    Reload the newest row of every cell and swap the snapshot in atomically.
+    With force=False the reload is skipped when india_aqi_cells is unchanged.
+    """
+    global _snapshot, _fingerprint
+    with _refresh_lock:
+        with db_cursor() as cur:
+            fp = _db_fingerprint(cur)
+            if not force and fp == _fingerprint:
+                return _snapshot
+            cur.execute(
+                """
+                SELECT i.lat, i.lon, i.dt, i.pm25, i.pm10, i.no2, i.so2, i.o3, i.co, i.aqi
+                FROM india_aqi_cells c
+                JOIN india_aqi i ON i.lat = c.lat AND i.lon = c.lon AND i.dt = c.latest_dt
+                """
+            )
+            rows = cur.fetchall()
+        _snapshot = GridSnapshot(_snapshot.version + 1, rows)
+        _fingerprint = fp
+        print(f"[SNAPSHOT] v{_snapshot.version} loaded: {_snapshot.size} cells")
+        return _snapshot
+
+
+def notify(cur, payload=""):
+    """Announce new india_aqi data to listening processes (delivered on commit)."""
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+
+
+def _poll_loop():
+    """
+    Reload on NOTIFY from a sweep (in this or another process), and check
+    the fingerprint every POLL_SECONDS regardless, for writers that don't
+    notify or while the LISTEN connection is down.
+    """
+    conn = None
+    while True:
+        try:
+            if SNAPSHOT_LISTEN and conn is None:
+                conn = get_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+            refresh(force=False)
+            if conn is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            deadline = time.monotonic() + POLL_SECONDS
+            while (remaining := deadline - time.monotonic()) > 0:
+                if select.select([conn], [], [], remaining) == ([], [], []):
+                    break
+                conn.poll()
+                if conn.notifies:
+                    print(f"[SNAPSHOT] Notified: {conn.notifies[-1].payload or 'india_aqi updated'}")
+                    conn.notifies.clear()
+                    refresh(force=True)
+        except Exception as e:
+            print(f"[SNAPSHOT ERROR] {e}")
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            time.sleep(POLL_SECONDS)
+
+
+def start_poller():
+    """Load once, then watch for new sweeps (LISTEN + periodic check) in a daemon thread."""
+    t = threading.Thread(target=_poll_loop, daemon=True, name="grid-snapshot")
+    t.start()
+    return t
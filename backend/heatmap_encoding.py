@@ -0,0 +1,110 @@
+# backend/heatmap_encoding.py
+# Compact encodings for heatmap grids.
+#
+#   json  - nested float lists (original format)
+#   u16   - AQI * 100 as little-endian uint16 (0.01 AQI resolution)
+#   u8    - AQI * 0.5 as uint8 (2 AQI resolution)
+#   png   - 8-bit RGBA tile coloured with the frontend AQI palette
+#
+# u16/u8 are served either raw (application/octet-stream with the binary
+# header below) or base64 inside JSON (format=u16_b64 / u8_b64).
+#
+# Binary header (little-endian, 30 bytes):
+#   4s magic "AQIG" | B version | B dtype (1=u8, 2=u16) | H rows | H cols
+#   | f scale | 4f bounds (min_lat, max_lat, min_lon, max_lon)
+# followed by rows*cols values, row-major from min_lat upwards.
+# Decoded AQI = stored value / scale.
+import base64
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"AQIG"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHf4f")
+DTYPES = {"u8": (1, np.uint8, 0.5), "u16": (2, np.uint16, 100.0)}
+
+FORMATS = ("json", "u16", "u8", "u16_b64", "u8_b64", "png")
+MEDIA_TYPES = {
+    "application/octet-stream": "u16",
+    "image/png": "png",
+    "application/json": "json",
+}
+
+# AQI band colours (upper bound, RGB), matching the frontend legend
+PALETTE = [
+    (50, (0, 228, 0)),
+    (100, (255, 255, 0)),
+    (150, (255, 126, 0)),
+    (200, (255, 0, 0)),
+    (300, (143, 63, 151)),
+    (500, (126, 0, 24)),
+]
+
+
+def negotiate(fmt, accept):
+    """Explicit ?format= wins; otherwise the first recognised Accept media type."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        return fmt
+    for part in (accept or "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in MEDIA_TYPES:
+            return MEDIA_TYPES[media]
+    return "json"
+
+
+def quantize(grid, kind):
+    _, dtype, scale = DTYPES[kind]
+    info = np.iinfo(dtype)
+    return np.clip(np.rint(np.asarray(grid) * scale), 0, info.max).astype(dtype)
+
+
+def encode_binary(grid, bounds, kind):
+    code, dtype, scale = DTYPES[kind]
+    q = quantize(grid, kind)
+    rows, cols = q.shape
+    header = HEADER.pack(MAGIC, VERSION, code, rows, cols, scale, *bounds)
+    return header + q.astype(np.dtype(dtype).newbyteorder("<"), copy=False).tobytes()
+
+
+def decode_binary(buf):
+    """Inverse of encode_binary; returns (grid, bounds)."""
+    magic, version, code, rows, cols, scale, *bounds = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not an AQIG v1 buffer")
+    dtype = np.uint8 if code == 1 else np.dtype("<u2")
+    q = np.frombuffer(buf, dtype=dtype, offset=HEADER.size, count=rows * cols)
+    return q.reshape(rows, cols) / scale, tuple(bounds)
+
+
+def encode_b64(grid, kind):
+    return base64.b64encode(quantize(grid, kind).astype(np.dtype(DTYPES[kind][1]).newbyteorder("<"), copy=False).tobytes()).decode("ascii")
+
+
+def _colorize(grid):
+    grid = np.asarray(grid)
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    lower = -np.inf
+    for upper, rgb in PALETTE:
+        mask = (grid > lower) & (grid <= upper)
+        rgba[mask, :3] = rgb
+        lower = upper
+    rgba[grid > PALETTE[-1][0], :3] = PALETTE[-1][1]
+    rgba[..., 3] = 255  # overlay opacity is applied by the map layer
+    return rgba
+
+
+def encode_png(grid):
+    """RGBA PNG, north-up (first image row is max_lat)."""
+    rgba = _colorize(grid)[::-1]
+    height, width = rgba.shape[:2]
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, -1)], axis=1)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
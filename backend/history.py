@@ -0,0 +1,112 @@
+# backend/history.py
+# Per-location history reads for /aqi/history.
+#
+# A location resolves to the grid cells within radius_km (the nearest cell
+# if none are that close), each weighted by inverse distance. Raw rows are
+# then read per cell as a dt range through the india_aqi (lat, lon, dt)
+# primary key, so cost follows the window length and the number of cells,
+# not the table size. Means and standard deviations are weighted by the
+# cells' weights; counts, medians and extremes are not.
+import math
+import os
+from spatial import nearest_india_cell, nearest_india_cells
+
+IDW_POWER = float(os.getenv("HISTORY_IDW_POWER", "2"))
+IDW_MIN_KM = float(os.getenv("HISTORY_IDW_MIN_KM", "1"))      # closer cells count as this far
+MAX_CELLS = int(os.getenv("HISTORY_MAX_CELLS", "50"))        # nearest cells kept within the radius
+RAW_ROW_LIMIT = int(os.getenv("HISTORY_RAW_ROW_LIMIT", "5000"))  # default page size of /raw
+
+METRICS = ("aqi", "pm25", "pm10", "co", "no2", "so2", "o3")
+
+
+def resolve_cells(cur, lat, lon, radius_km):
+    """
+    Cells for a location as [(lat, lon, distance_km, weight)], nearest
+    first, weights summing to 1.
+    """
+    cells = nearest_india_cells(cur, lat, lon, radius_km, limit=MAX_CELLS)
+    if not cells:
+        cell = nearest_india_cell(cur, lat, lon)
+        cells = [cell] if cell else []
+    raw = [1.0 / max(c[2], IDW_MIN_KM) ** IDW_POWER for c in cells]
+    total = sum(raw)
+    return [(c[0], c[1], float(c[2]), w / total) for c, w in zip(cells, raw)]
+
+
+def _cells_join(cells):
+    return ("JOIN unnest(%s::float8[], %s::float8[], %s::float8[], %s::float8[]) "
+            "AS c(lat, lon, distance_km, w) USING (lat, lon)",
+            [[c[0] for c in cells], [c[1] for c in cells], [c[2] for c in cells], [c[3] for c in cells]])
+
+
+def raw_rows(cur, cells, since, limit=RAW_ROW_LIMIT, after=None):
+    """
+    Raw rows of `cells` since `since` (naive UTC), or after timestamp
+    `after` when paging, time-ordered, nearest cell first per timestamp.
+    Returns (rows, next_after): at most `limit` rows, cut back to whole
+    timestamps, and the cursor for the next page (None on the last one).
+    """
+    join, params = _cells_join(cells)
+    cur.execute(
+        f"""
+        SELECT lat AS latitude, lon AS longitude, round(c.distance_km::numeric, 2)::float8 AS distance_km,
+               aqi, pm25, pm10, co, no2, so2, o3, dt AS timestamp
+        FROM india_aqi {join}
+        WHERE dt >= %s AND (%s::timestamp IS NULL OR dt > %s)
+        ORDER BY dt ASC, c.distance_km ASC
+        LIMIT %s
+        """,
+        params + [since, after, after, limit + 1]
+    )
+    cols = [d.name for d in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    if len(rows) <= limit:
+        return rows, None
+    # more remain: drop the partial last timestamp so a page never splits one
+    last = rows[-1]["timestamp"]
+    rows = [r for r in rows if r["timestamp"] != last]
+    return rows, rows[-1]["timestamp"] if rows else None
+
+
+_SUMMARY_SQL = """
+    SELECT COUNT(*), {aggs} FROM india_aqi {{join}}
+    WHERE dt >= %s
+""".format(aggs=", ".join(
+    f"COUNT({m}), SUM(c.w) FILTER (WHERE {m} IS NOT NULL), SUM(c.w * {m}), SUM(c.w * {m}::float8 * {m}), "
+    f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {m}), MIN({m}), MAX({m})"
+    for m in METRICS
+))
+
+
+def summary_stats(cur, cells, since):
+    """
+    count/mean/median/std/min/max per pollutant over the raw rows of
+    `cells` since `since`, aggregated in one statement that returns one row.
+    Returns (readings, {metric: stats}).
+    """
+    join, params = _cells_join(cells)
+    cur.execute(_SUMMARY_SQL.format(join=join), params + [since])
+    row = cur.fetchone()
+    stats = {}
+    for i, m in enumerate(METRICS):
+        n, wn, total, sq, median, lo, hi = row[1 + 7 * i:8 + 7 * i]
+        stats[m] = {"count": int(n), "mean": None, "median": None, "std": None, "min": None, "max": None}
+        if n and wn:
+            mean = total / wn
+            stats[m].update(mean=float(mean), median=float(median),
+                            std=float(math.sqrt(max(sq / wn - mean * mean, 0.0))),
+                            min=float(lo), max=float(hi))
+    return int(row[0]), stats
+
+
+def latest_reading(cur, cell):
+    """Newest raw row of one grid cell, via the (lat, lon, dt) primary key."""
+    cur.execute(
+        """
+        SELECT lat AS latitude, lon AS longitude, dt AS timestamp, aqi, pm25, pm10, co, no2, so2, o3 FROM india_aqi
+        WHERE lat = %s AND lon = %s ORDER BY dt DESC LIMIT 1
+        """,
+        (cell[0], cell[1])
+    )
+    row = cur.fetchone()
+    return dict(zip([d.name for d in cur.description], row)) if row else None
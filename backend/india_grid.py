@@ -0,0 +1,206 @@
+# backend/india_grid.py
+# Sample points for the India sweep.
+#
+# The base lattice covers the India box at INDIA_GRID_STEP degrees and, with
+# the land mask on, keeps only points on (or within INDIA_GRID_MASK_BUFFER_KM
+# of) the coarse India outline below, dropping open sea and neighbouring
+# countries. Two refinements then add INDIA_GRID_REFINE_STEP points:
+#   - around the first INDIA_GRID_REFINE_CITIES gazetteer cities
+#   - inside base cells whose last-sweep AQI differs from a neighbour by at
+#     least INDIA_GRID_VARIANCE_AQI (needs a loaded grid snapshot)
+# All points sit on multiples of their step, so repeated sweeps hit the same
+# coordinates. The list is built once and cached; only the variance
+# refinement makes it depend on the snapshot version.
+import csv
+import os
+import threading
+import numpy as np
+import grid_snapshot
+from geocode import GAZETTEER_PATH
+from spatial import KM_PER_DEG_LAT
+
+BOUNDS = (6.0, 38.0, 68.0, 98.0)   # min_lat, max_lat, min_lon, max_lon
+GRID_STEP = float(os.getenv("INDIA_GRID_STEP", "1.0"))
+GRID_MASK = os.getenv("INDIA_GRID_MASK", "1") not in ("0", "false", "no")
+MASK_BUFFER_KM = float(os.getenv("INDIA_GRID_MASK_BUFFER_KM", "40"))
+REFINE_STEP = float(os.getenv("INDIA_GRID_REFINE_STEP", "0.25"))
+REFINE_CITIES = int(os.getenv("INDIA_GRID_REFINE_CITIES", "0"))        # 0 = off
+REFINE_RADIUS_KM = float(os.getenv("INDIA_GRID_REFINE_RADIUS_KM", "30"))
+VARIANCE_AQI = float(os.getenv("INDIA_GRID_VARIANCE_AQI", "0"))        # 0 = off
+MAX_POINTS = int(os.getenv("INDIA_GRID_MAX_POINTS", "3000"))           # cap on base + refined points
+
+# Coarse outline (lon, lat): mainland clockwise from the Rann of Kutch,
+# leaving Bangladesh out through the Siliguri corridor, plus the Andaman
+# and Nicobar Islands. Good to ~20-30 km, which the buffer absorbs.
+MAINLAND = [
+    (68.2, 23.6), (69.6, 24.3), (71.1, 24.4), (70.6, 25.7), (70.0, 26.6), (69.5, 27.2),
+    (70.4, 28.0), (71.9, 27.9), (72.9, 29.0), (73.4, 29.9), (74.0, 30.4), (74.6, 31.1),
+    (74.6, 31.9), (75.0, 32.5), (74.3, 32.8), (73.9, 33.7), (73.9, 34.5), (74.9, 34.7),
+    (76.8, 35.6), (77.8, 35.5), (78.3, 34.6), (78.9, 34.2), (78.7, 33.3), (79.4, 32.5),
+    (78.8, 31.9), (79.0, 31.1), (80.2, 30.6), (81.0, 30.2), (80.1, 28.8), (81.5, 27.9),
+    (82.7, 27.5), (84.1, 27.5), (84.6, 27.1), (85.6, 26.8), (86.9, 26.4), (88.0, 26.4),
+    (88.1, 27.3), (88.6, 28.1), (88.9, 27.3), (89.8, 26.7), (91.5, 26.8), (92.1, 26.9),
+    (92.0, 27.5), (92.6, 27.9), (93.8, 28.6), (95.3, 29.2), (96.4, 29.3), (97.4, 28.3),
+    (97.1, 27.7), (96.2, 27.3), (95.2, 26.6), (94.6, 25.6), (94.7, 25.0), (94.2, 24.0),
+    (93.4, 23.9), (93.4, 22.9), (93.1, 22.2), (92.7, 21.9), (92.3, 22.8), (92.0, 23.6),
+    (91.6, 22.9), (91.2, 23.5), (91.4, 24.1), (92.1, 24.4), (92.4, 24.9), (92.0, 25.2),
+    (90.0, 25.3), (89.8, 25.9), (89.0, 26.2), (88.4, 26.5), (88.1, 26.0), (88.5, 25.5),
+    (88.1, 24.9), (88.7, 24.3), (88.6, 23.6), (88.9, 23.2), (89.1, 22.1), (89.0, 21.6),
+    (88.1, 21.6), (87.0, 21.5), (86.5, 20.3), (85.5, 19.7), (84.8, 19.2), (84.1, 18.3),
+    (83.3, 17.6), (82.3, 16.6), (81.3, 16.3), (80.9, 15.7), (80.1, 15.2), (80.3, 13.5),
+    (80.3, 13.0), (79.9, 12.0), (79.8, 10.3), (79.2, 9.3), (78.2, 8.8), (77.5, 8.1),
+    (76.5, 8.9), (76.2, 10.0), (75.7, 11.3), (74.8, 12.9), (74.1, 14.8), (73.4, 16.6),
+    (72.8, 19.0), (72.7, 21.1), (72.5, 21.6), (72.6, 22.2), (72.2, 21.3), (71.0, 20.7),
+    (69.6, 21.6), (69.0, 22.3), (69.8, 22.7), (68.9, 23.1),
+]
+ANDAMAN_NICOBAR = [(92.2, 13.7), (93.1, 13.7), (93.1, 10.5), (94.0, 6.7), (93.3, 6.7), (92.4, 10.5)]
+OUTLINE = [MAINLAND, ANDAMAN_NICOBAR]
+
+_cache = {"key": None, "points": None}
+_cache_lock = threading.Lock()
+
+
+def lattice(min_lat, max_lat, min_lon, max_lon, step):
+    """(lat, lon) arrays of every multiple of `step` inside the box."""
+    lats = np.arange(np.ceil(min_lat / step - 1e-9), np.floor(max_lat / step + 1e-9) + 1) * step
+    lons = np.arange(np.ceil(min_lon / step - 1e-9), np.floor(max_lon / step + 1e-9) + 1) * step
+    mlat, mlon = np.meshgrid(lats, lons, indexing="ij")
+    return np.round(mlat.ravel(), 4), np.round(mlon.ravel(), 4)
+
+
+def _inside(polygon, lats, lons):
+    """Even-odd ray casting, vectorized over points."""
+    inside = np.zeros(len(lats), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        crosses = (y1 > lats) != (y2 > lats)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (lons < x_at)
+    return inside
+
+
+def _edge_distance_km(polygon, lats, lons):
+    """Distance from each point to the nearest polygon edge (equirectangular)."""
+    kx = np.cos(np.radians(lats))
+    best = np.full(len(lats), np.inf)
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        # work in km around each point
+        ax, ay = (x1 - lons) * kx, (y1 - lats)
+        bx, by = (x2 - lons) * kx, (y2 - lats)
+        dx, dy = bx - ax, by - ay
+        seg = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(seg > 0, seg, 1), 0, 1)
+        px, py = ax + t * dx, ay + t * dy
+        best = np.minimum(best, np.hypot(px, py) * KM_PER_DEG_LAT)
+    return best
+
+
+def land_mask(lats, lons, buffer_km=MASK_BUFFER_KM):
+    """True for points inside the India outline or within buffer_km of it."""
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    keep = np.zeros(len(lats), dtype=bool)
+    for polygon in OUTLINE:
+        keep |= _inside(polygon, lats, lons)
+        if buffer_km > 0:
+            keep |= _edge_distance_km(polygon, lats, lons) <= buffer_km
+    return keep
+
+
+def _cities(limit):
+    with open(GAZETTEER_PATH, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))[:limit]
+    return [(float(r["lat"]), float(r["lon"])) for r in rows]
+
+
+def _around_cities(limit, step, radius_km):
+    lats, lons = [], []
+    for clat, clon in _cities(limit):
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = dlat / max(np.cos(np.radians(clat)), 0.1)
+        la, lo = lattice(clat - dlat, clat + dlat, clon - dlon, clon + dlon, step)
+        near = ((la - clat) * KM_PER_DEG_LAT) ** 2 + ((lo - clon) * KM_PER_DEG_LAT * np.cos(np.radians(clat))) ** 2
+        keep = near <= radius_km ** 2
+        lats.append(la[keep])
+        lons.append(lo[keep])
+    if not lats:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(lats), np.concatenate(lons)
+
+
+def _high_variance_cells(snap, base_step, threshold):
+    """
+    Centres of sampled base cells whose AQI differs from a neighbouring
+    base cell by at least `threshold`, most variable first.
+    """
+    aqi = snap.values["aqi"]
+    on_base = np.isclose(np.round(snap.lats / base_step) * base_step, snap.lats) & \
+        np.isclose(np.round(snap.lons / base_step) * base_step, snap.lons) & ~np.isnan(aqi)
+    idx = np.flatnonzero(on_base)
+    if len(idx) < 2:
+        return []
+    lookup = {(round(snap.lats[k] / base_step), round(snap.lons[k] / base_step)): aqi[k] for k in idx}
+    spread = []
+    for (i, j), v in lookup.items():
+        diffs = [abs(v - lookup[(i + di, j + dj)]) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                 if (di or dj) and (i + di, j + dj) in lookup]
+        if diffs and max(diffs) >= threshold:
+            spread.append((max(diffs), round(i * base_step, 4), round(j * base_step, 4)))
+    spread.sort(reverse=True)
+    return [(lat, lon) for _, lat, lon in spread]
+
+
+def build_points(step=GRID_STEP, mask=GRID_MASK, refine_cities=REFINE_CITIES,
+                 variance_aqi=VARIANCE_AQI, snap=None, max_points=MAX_POINTS):
+    """Base lattice (masked) plus refinement points, base first, as [(lat, lon)]."""
+    lats, lons = lattice(*BOUNDS, step)
+    if mask:
+        keep = land_mask(lats, lons)
+        lats, lons = lats[keep], lons[keep]
+    points = list(zip(lats.tolist(), lons.tolist()))
+    seen = set(points)
+
+    def add(extra_lats, extra_lons):
+        for p in zip(np.round(extra_lats, 4).tolist(), np.round(extra_lons, 4).tolist()):
+            if len(points) >= max_points:
+                return
+            if p not in seen:
+                seen.add(p)
+                points.append(p)
+
+    def masked(la, lo):
+        if not mask or not len(la):
+            return la, lo
+        keep = land_mask(la, lo)
+        return la[keep], lo[keep]
+
+    if refine_cities > 0:
+        add(*masked(*_around_cities(refine_cities, REFINE_STEP, REFINE_RADIUS_KM)))
+
+    if variance_aqi > 0 and snap is not None and snap.size:
+        half = step / 2
+        cells = _high_variance_cells(snap, step, variance_aqi)
+        if cells:
+            # most variable cells first; the cap cuts off the calmest ones
+            sub = [lattice(clat - half, clat + half, clon - half, clon + half, REFINE_STEP) for clat, clon in cells]
+            add(*masked(np.concatenate([a for a, _ in sub]), np.concatenate([b for _, b in sub])))
+    return points
+
+
+def points():
+    """Cached sweep point list; rebuilt only when its inputs change."""
+    snap = None
+    if VARIANCE_AQI > 0:
+        snap = grid_snapshot.current()
+        if not snap.size:
+            try:
+                snap = grid_snapshot.refresh(force=False)
+            except Exception as e:
+                print(f"[GRID] no snapshot for variance refinement: {e}")
+    key = snap.version if snap is not None else None
+    with _cache_lock:
+        if _cache["points"] is None or _cache["key"] != key:
+            _cache["points"] = build_points(snap=snap)
+            _cache["key"] = key
+            print(f"[GRID] {len(_cache['points'])} sweep points (step={GRID_STEP}, mask={GRID_MASK}, "
+                  f"cities={REFINE_CITIES}, variance={VARIANCE_AQI})")
+        return _cache["points"]
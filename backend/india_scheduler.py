@@ -1,21 +1,38 @@
 # backend/india_scheduler.py
-import schedule
-import time
-from fetch_india_aqi import run_india_update
-from database import cleanup_old_records
+# Worker process for the India sweep and the retention cleanup (see
+# scheduler.py). Run it with SCHEDULER_MODE=worker on the web service so
+# sweeps don't share CPU, DB pool or memory with request handling; a
+# finished sweep NOTIFYs the web processes, which reload their snapshot.
+# Several workers may run; leader election keeps the jobs to one.
+#
+#   python india_scheduler.py                     # run jobs on their cron specs
+#   python india_scheduler.py --once india_sweep  # run one job now and exit
+import argparse
+import signal
+import sys
+from migrate import run_migrations
+from scheduler import default_scheduler
 
-print("India AQI scheduler started (11:00 AM & 11:00 PM IST). Press Ctrl+C to stop.")
-print("Database cleanup scheduled (once daily at 12:00 AM IST).")
 
-run_india_update()       # run once immediately at startup
-cleanup_old_records()    # clean stale data at startup too
+def _terminate(signum, frame):
+    # SystemExit unwinds a running sweep through its interrupt path, so the
+    # next run resumes it instead of starting over
+    sys.exit(0)
 
-# Schedule at fixed times (IST)
-# Note: Render uses UTC, so converting IST to UTC:
-# 11:00 AM IST = 05:30 UTC
-# 11:00 PM IST = 17:30 UTC
-# 12:00 AM IST = 18:30 UTC (previous day)
 
-schedule.every().day.at("05:30").do(run_india_update)  # 11:00 AM IST
-schedule.every().day.at("17:30").do(run_india_update)  # 11:00 PM IST
-schedule.every().day.at("18:30").do(cleanup_old_records)  # 12:00 AM IST (daily cleanup)
+if __name__ == "__main__":
+    scheduler = default_scheduler()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", choices=[job.name for job in scheduler.jobs],
+                    help="run this job immediately and exit")
+    args = ap.parse_args()
+
+    signal.signal(signal.SIGTERM, _terminate)
+    run_migrations()
+    if args.once:
+        job = next(job for job in scheduler.jobs if job.name == args.once)
+        result = job.fn()
+        print(f"[WORKER] {job.name} finished: {result}")
+    else:
+        print("[WORKER] Scheduler worker started")
+        scheduler.run_forever()
@@ -0,0 +1,104 @@
+# backend/interpolation.py
+# Pluggable interpolation backends for the AQI heatmap.
+#
+# Every backend takes scattered samples (lats, lons, values) and returns a
+# (len(grid_lats), len(grid_lons)) array evaluated on the output lattice.
+import os
+import numpy as np
+from scipy.interpolate import Rbf, RBFInterpolator, RegularGridInterpolator
+from scipy.spatial import cKDTree
+
+DEFAULT_METHOD = os.getenv("HEATMAP_INTERPOLATION", "bilinear")
+RBF_DENSE_LIMIT = int(os.getenv("HEATMAP_RBF_DENSE_LIMIT", "500"))  # above this, solve locally
+RBF_NEIGHBORS = int(os.getenv("HEATMAP_RBF_NEIGHBORS", "32"))
+IDW_NEIGHBORS = int(os.getenv("HEATMAP_IDW_NEIGHBORS", "8"))
+IDW_POWER = 2.0
+
+
+def _rbf_legacy(lats, lons, values, grid_lats, grid_lons, lattice=None):
+    """scipy.interpolate.Rbf on a full meshgrid (dense O(N·M) distance matrix)."""
+    rbf = Rbf(lons, lats, values, function="linear")
+    gx, gy = np.meshgrid(grid_lons, grid_lats)
+    return rbf(gx, gy)
+
+
+def _rbf(lats, lons, values, grid_lats, grid_lons, lattice=None):
+    """
+    RBFInterpolator; dense up to RBF_DENSE_LIMIT samples, then restricted to
+    the RBF_NEIGHBORS nearest samples (one small solve per output point).
+    """
+    pts = np.column_stack([lons, lats])
+    neighbors = RBF_NEIGHBORS if len(values) > RBF_DENSE_LIMIT else None
+    rbf = RBFInterpolator(pts, values, kernel="linear", neighbors=neighbors)
+    gx, gy = np.meshgrid(grid_lons, grid_lats)
+    out = rbf(np.column_stack([gx.ravel(), gy.ravel()]))
+    return out.reshape(len(grid_lats), len(grid_lons))
+
+
+def _idw_at(lats, lons, values, qlats, qlons):
+    tree = cKDTree(np.column_stack([lons, lats]))
+    k = min(IDW_NEIGHBORS, len(values))
+    dist, idx = tree.query(np.column_stack([qlons, qlats]), k=k)
+    if k == 1:
+        dist, idx = dist[:, None], idx[:, None]
+    w = 1.0 / np.maximum(dist, 1e-12) ** IDW_POWER
+    return (w * values[idx]).sum(axis=1) / w.sum(axis=1)
+
+
+def _idw(lats, lons, values, grid_lats, grid_lons, lattice=None):
+    """Inverse-distance weighting over the k nearest samples (KD-tree)."""
+    gx, gy = np.meshgrid(grid_lons, grid_lats)
+    out = _idw_at(lats, lons, values, gy.ravel(), gx.ravel())
+    return out.reshape(len(grid_lats), len(grid_lons))
+
+
+def _bilinear(lats, lons, values, grid_lats, grid_lons, lattice=None):
+    """
+    Separable bilinear interpolation on the regular sample lattice
+    (lattice = (node_lats, node_lons)). Lattice nodes without a sample are
+    filled by IDW first; without a lattice this degrades to IDW.
+    """
+    if lattice is None:
+        return _idw(lats, lons, values, grid_lats, grid_lons)
+    node_lats, node_lons = (np.asarray(a, dtype=float) for a in lattice)
+    if len(node_lats) < 2 or len(node_lons) < 2 or (np.diff(node_lats) <= 0).any() or (np.diff(node_lons) <= 0).any():
+        return _idw(lats, lons, values, grid_lats, grid_lons)
+    ml, mo = np.meshgrid(node_lats, node_lons, indexing="ij")
+    nodes = _idw_at(lats, lons, values, ml.ravel(), mo.ravel()).reshape(ml.shape)
+    interp = RegularGridInterpolator((node_lats, node_lons), nodes, bounds_error=False, fill_value=None)
+    gy, gx = np.meshgrid(grid_lats, grid_lons, indexing="ij")
+    return interp(np.column_stack([gy.ravel(), gx.ravel()])).reshape(gy.shape)
+
+
+def _merge_duplicates(lats, lons, values):
+    """
+    Average samples that share coordinates (to ~1e-6 deg): RBF solves are
+    singular or wildly unstable when one node carries two values.
+    """
+    keys = np.round(np.column_stack([lats, lons]), 6)
+    uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    if len(uniq) == len(values):
+        return lats, lons, values
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=values) / counts
+    return uniq[:, 0], uniq[:, 1], means
+
+
+BACKENDS = {
+    "rbf_legacy": _rbf_legacy,
+    "rbf": _rbf,
+    "idw": _idw,
+    "bilinear": _bilinear,
+}
+
+
+def interpolate(lats, lons, values, grid_lats, grid_lons, method=None, lattice=None):
+    method = method or DEFAULT_METHOD
+    if method not in BACKENDS:
+        raise ValueError(f"unknown interpolation method '{method}' (choose from {', '.join(BACKENDS)})")
+    lats, lons, values = _merge_duplicates(
+        np.asarray(lats, dtype=float), np.asarray(lons, dtype=float), np.asarray(values, dtype=float))
+    return BACKENDS[method](
+        lats, lons, values, np.asarray(grid_lats, dtype=float), np.asarray(grid_lons, dtype=float), lattice,
+    )
@@ -1,21 +1,30 @@
 # main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+import asyncio
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-import requests
 import numpy as np
-from scipy.interpolate import Rbf
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-import threading
-import schedule
 import time
-from database import get_connection
+from concurrent.futures import ThreadPoolExecutor, wait
+from database import db_cursor, pool_stats, close_pool
+import grid_snapshot
+import partitions
 from analytics import router as analytics_router
 from aqi_utils import compute_aqi_for_row
 from news_fetcher import fetch_news
-from fetch_india_aqi import run_india_update
-from database import cleanup_old_records
+import async_support
+from geocode import GEOCODER
+from owm_cache import OWM_CACHE, afetch_air_pollution, air_pollution_url, fetch_air_pollution
+import heatmap_encoding
+from interpolation import BACKENDS as INTERPOLATION_BACKENDS, DEFAULT_METHOD as DEFAULT_INTERPOLATION, interpolate
+from spatial import bbox_for_radius, haversine_sql, nearest_india_cell
+from scheduler import SCHEDULER_MODE, default_scheduler, job_history
+from migrate import run_migrations
+from write_behind import AIR_QUALITY_WRITER
+from sweep_progress import recent_sweeps
 
 # Load .env
 load_dotenv()
@@ -31,80 +40,62 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Heatmap-Bounds", "X-Heatmap-Encoding", "X-Heatmap-Encode-Ms",
+                    "X-Heatmap-Source", "X-Heatmap-Samples", "X-Heatmap-Stale"],
 )
 
 # ============================================================
-# SCHEDULER (Background Thread)
+# SCHEDULER (India sweeps + cleanup; see scheduler.py)
 # ============================================================
-def run_scheduler():
-    """Run scheduler in background thread (fixed times: 12:35 AM & 12:35 PM IST)"""
-    import pytz
-    from datetime import datetime, timezone, timedelta
-    
-    print("="*60)
-    print("India AQI scheduler started (12:35 AM & 12:35 PM IST)")
-    print("="*60)
-    print(f"Current server time (UTC): {datetime.utcnow()}")
-    print("Scheduled tasks:")
-    print("  - 12:35 AM IST → Fetch AQI data")
-    print("  - 12:35 PM IST → Fetch AQI data")
-    print("  - 12:00 AM IST → Cleanup old records (>30 days)")
-    print("="*60)
-    
-    # IST timezone
-    ist = pytz.timezone('Asia/Kolkata')
-    last_execute_time = None
-    
-    while True:
-        try:
-            now_ist = datetime.now(ist)
-            current_time = now_ist.strftime("%H:%M")
-            
-            # Execute at 12:35 AM
-            if current_time == "00:35" and last_execute_time != "00:35":
-                print(f"[{current_time} IST] Fetching India AQI data...")
-                try:
-                    run_india_update()
-                    print(f"[{current_time} IST] ✓ Data fetch completed")
-                except Exception as e:
-                    print(f"[{current_time} IST] ✗ Error: {e}")
-                last_execute_time = "00:35"
-            
-            # Execute at 12:35 PM  
-            elif current_time == "12:35" and last_execute_time != "12:35":
-                print(f"[{current_time} IST] Fetching India AQI data...")
-                try:
-                    run_india_update()
-                    print(f"[{current_time} IST] ✓ Data fetch completed")
-                except Exception as e:
-                    print(f"[{current_time} IST] ✗ Error: {e}")
-                last_execute_time = "12:35"
-            
-            # Execute at 12:00 AM (midnight)
-            elif current_time == "00:00" and last_execute_time != "00:00":
-                print(f"[{current_time} IST] Cleaning up old records...")
-                try:
-                    cleanup_old_records()
-                    print(f"[{current_time} IST] ✓ Cleanup completed")
-                except Exception as e:
-                    print(f"[{current_time} IST] ✗ Error: {e}")
-                last_execute_time = "00:00"
-            
-            # Check every 30 seconds
-            time.sleep(30)
-        except Exception as e:
-            print(f"[SCHEDULER ERROR] {e}")
-            time.sleep(60)
+# SCHEDULER_MODE=worker runs the jobs in india_scheduler.py instead; this
+# process then only picks up finished sweeps (grid_snapshot LISTEN).
+SCHEDULER = default_scheduler() if SCHEDULER_MODE == "inprocess" else None
 
 @app.on_event("startup")
 async def startup_event():
-    """Start scheduler in background thread on app startup"""
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    print("[APP] Scheduler thread started in background")
+    """Apply pending migrations, then start the scheduler in a background thread (in-process mode)"""
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"[MIGRATE ERROR] {e}")
+    partitions.ensure_all()
+    grid_snapshot.start_poller()
+    AIR_QUALITY_WRITER.start()
+    if SCHEDULER is not None:
+        SCHEDULER.start()
+        print("[APP] Scheduler thread started in background")
+    else:
+        print(f"[APP] Scheduler mode '{SCHEDULER_MODE}': jobs not run in this process")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued writes, then release HTTP clients, pooled database connections and worker threads"""
+    if SCHEDULER is not None:
+        SCHEDULER.stop()
+    AIR_QUALITY_WRITER.close()
+    await async_support.close()
+    HEATMAP_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    close_pool()
 
 HEADERS = {"User-Agent": "AQI-Insight-App"}
 
+# Heatmap sample acquisition runs on a shared pool so one request can't
+# hold a handler thread for sample_grid² sequential round trips
+HEATMAP_WORKERS = int(os.getenv("HEATMAP_WORKERS", "16"))
+HEATMAP_DEADLINE_S = float(os.getenv("HEATMAP_DEADLINE_S", "6"))
+HEATMAP_EXECUTOR = ThreadPoolExecutor(max_workers=HEATMAP_WORKERS, thread_name_prefix="heatmap")
+
+# India grid box covered by the scheduled sweeps; heatmaps inside it can be
+# drawn from the stored grid. Grid points this far outside the requested box
+# are included so its edges interpolate between real cells.
+INDIA_BOUNDS = (6, 38, 68, 98)
+HEATMAP_GRID_MARGIN_DEG = 1.5
+HEATMAP_SOURCES = ("auto", "live", "grid")
+# source=auto samples live instead once the snapshot's newest reading is
+# older than this (default: two 12-hourly sweeps), e.g. when the sweep or
+# the snapshot poller has stalled
+HEATMAP_GRID_MAX_AGE_S = float(os.getenv("HEATMAP_GRID_MAX_AGE_S", "86400"))
+
 # ============================================================
 # OPENWEATHER → Convert AQI 1–5 → 0–300 scale (frontend friendly)
 # ============================================================
@@ -120,63 +111,42 @@ def owm_aqi_to_numeric(idx):
 # ============================================================
 # DB SAVE — stores the fetched live API results
 # ============================================================
-def save_to_db(lat, lon, data):
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            INSERT INTO air_quality
-            (latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """,
-            (
-                lat, lon,
-                data.get("aqi"),
-                data.get("pm25"),
-                data.get("pm10"),
-                data.get("co"),
-                data.get("no2"),
-                data.get("so2"),
-                data.get("o3"),
-                datetime.now(timezone.utc)
-            )
-        )
-
-        conn.commit()
-        cur.close()
-        conn.close()
-
-    except Exception as e:
-        print("DB INSERT ERROR:", e)
+async def save_to_db(lat, lon, data):
+    """Queue the record for the write-behind writer; never waits on the DB."""
+    await AIR_QUALITY_WRITER.asubmit((
+        lat, lon,
+        data.get("aqi"),
+        data.get("pm25"),
+        data.get("pm10"),
+        data.get("co"),
+        data.get("no2"),
+        data.get("so2"),
+        data.get("o3"),
+        datetime.now(timezone.utc)
+    ))
 
 
 # ============================================================
 # FALLBACK 1 → Check user search history (air_quality table)
 # ============================================================
-def get_latest_from_air_quality(lat, lon, radius_deg=0.7):
-    """Return most recent AQI data near the coordinates."""
+def get_latest_from_air_quality(lat, lon, radius_km=75.0):
+    """Return most recent AQI data within radius_km (great-circle) of the coordinates."""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT aqi, pm25, pm10, co, no2, so2, o3, timestamp
-            FROM air_quality
-            WHERE ABS(latitude - %s) < %s
-              AND ABS(longitude - %s) < %s
-            ORDER BY timestamp DESC
-            LIMIT 1
-            """,
-            (lat, radius_deg, lon, radius_deg)
-        )
-
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        return row
+        min_lat, max_lat, min_lon, max_lon = bbox_for_radius(lat, lon, radius_km)
+        with db_cursor() as cur:
+            # box containment is served by the GiST index on point(longitude, latitude)
+            cur.execute(
+                f"""
+                SELECT aqi, pm25, pm10, co, no2, so2, o3, timestamp
+                FROM air_quality
+                WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s))
+                  AND {haversine_sql("latitude", "longitude")} <= %s
+                ORDER BY timestamp DESC
+                LIMIT 1
+                """,
+                (min_lon, min_lat, max_lon, max_lat, lat, lat, lon, radius_km)
+            )
+            return cur.fetchone()
 
     except Exception as e:
         print("air_quality fallback error:", e)
@@ -187,24 +157,42 @@ def get_latest_from_air_quality(lat, lon, radius_deg=0.7):
 # FALLBACK 2 → India AQI table (synced grid data)
 # ============================================================
 def get_nearest_india_aqi(lat, lon):
-    """Return nearest AQI from india_aqi table."""
+    """Return the latest reading of the nearest india_aqi grid cell."""
+    # In-memory snapshot of the last sweep answers without touching the DB
+    snap = grid_snapshot.current()
+    k = snap.nearest(lat, lon)
+    if k is not None:
+        rec = snap.record(k)
+        return {
+            "latitude": rec["latitude"],
+            "longitude": rec["longitude"],
+            "pm25": rec["pm25"],
+            "pm10": rec["pm10"],
+            "nitrogen_dioxide": rec["no2"],
+            "sulphur_dioxide": rec["so2"],
+            "ozone": rec["o3"],
+            "carbon_monoxide": rec["co"],
+            "aqi": rec["aqi"],
+            "timestamp": rec["timestamp"].isoformat(),
+            "snapshot": snap.info(),
+        }
+
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT pm25, pm10, no2, so2, o3, co, aqi, dt, lat, lon
-            FROM india_aqi
-            ORDER BY ABS(lat - %s) + ABS(lon - %s)
-            LIMIT 1
-            """,
-            (lat, lon)
-        )
-
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_cursor() as cur:
+            cell = nearest_india_cell(cur, lat, lon)
+            if not cell:
+                return None
+            cur.execute(
+                """
+                SELECT pm25, pm10, no2, so2, o3, co, aqi, dt, lat, lon
+                FROM india_aqi
+                WHERE lat = %s AND lon = %s
+                ORDER BY dt DESC
+                LIMIT 1
+                """,
+                (cell[0], cell[1])
+            )
+            row = cur.fetchone()
 
         if not row:
             return None
@@ -230,54 +218,64 @@ def get_nearest_india_aqi(lat, lon):
 # ============================================================
 # FETCH LIVE DATA FROM OPENWEATHER API
 # ============================================================
-def fetch_owm(lat, lon):
-    url = (
-        "http://api.openweathermap.org/data/2.5/air_pollution?"
-        f"lat={lat}&lon={lon}&appid={OWM_KEY}"
-    )
-
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=8)
-        resp.raise_for_status()
+def parse_owm_payload(js, fetched_at):
+    """Turn an air_pollution payload into the API's record shape (None if empty)."""
+    if "list" not in js or not js["list"]:
+        return None
 
-        js = resp.json()
-        if "list" not in js or not js["list"]:
-            return None
+    record = js["list"][0]
+    comp = record.get("components", {})
+    idx = record.get("main", {}).get("aqi")
 
-        record = js["list"][0]
-        comp = record.get("components", {})
-        idx = record.get("main", {}).get("aqi")
-
-        pm25 = comp.get("pm2_5")
-        pm10 = comp.get("pm10")
-        no2 = comp.get("no2")
-        so2 = comp.get("so2")
-        o3 = comp.get("o3")
-        co = comp.get("co")
-
-        # Compute AQI from concentrations so the UI shows actual AQI, not a 1-5 index
-        aqi_calc = compute_aqi_for_row(
-            {
-                "pm25": pm25,
-                "pm10": pm10,
-                "no2": no2,
-                "so2": so2,
-                "o3": o3,
-                "co": (co / 1000.0) if co is not None else None,
-            }
-        )
+    pm25 = comp.get("pm2_5")
+    pm10 = comp.get("pm10")
+    no2 = comp.get("no2")
+    so2 = comp.get("so2")
+    o3 = comp.get("o3")
+    co = comp.get("co")
 
-        return {
-            "aqi": aqi_calc.get("aqi") if aqi_calc else None,
+    # Compute AQI from concentrations so the UI shows actual AQI, not a 1-5 index
+    aqi_calc = compute_aqi_for_row(
+        {
             "pm25": pm25,
             "pm10": pm10,
-            "co": co,
             "no2": no2,
             "so2": so2,
             "o3": o3,
-            "raw_aqi_index": idx,
-            "fetched_at": datetime.now(timezone.utc).isoformat()
+            "co": (co / 1000.0) if co is not None else None,
         }
+    )
+
+    return {
+        "aqi": aqi_calc.get("aqi") if aqi_calc else None,
+        "pm25": pm25,
+        "pm10": pm10,
+        "co": co,
+        "no2": no2,
+        "so2": so2,
+        "o3": o3,
+        "raw_aqi_index": idx,
+        "fetched_at": fetched_at.isoformat()
+    }
+
+
+def fetch_owm(lat, lon):
+    try:
+        # Served from the shared geo-quantized cache when the cell is fresh
+        js, fetched_at = fetch_air_pollution(lat, lon, timeout=8, headers=HEADERS)
+        return parse_owm_payload(js, fetched_at)
+
+    except Exception as e:
+        print("OWM FETCH ERROR:", e)
+        return None
+
+
+async def afetch_owm(lat, lon):
+    """fetch_owm for the async request path (shared httpx client)."""
+    try:
+        js, fetched_at = await afetch_air_pollution(
+            async_support.get_http_client(), lat, lon, timeout=8, headers=HEADERS)
+        return parse_owm_payload(js, fetched_at)
 
     except Exception as e:
         print("OWM FETCH ERROR:", e)
@@ -292,68 +290,79 @@ def home():
     return {"status": "AQI Insight Backend Running"}
 
 
+# ============================================================
+# METRICS — connection pool and cache counters
+# ============================================================
+@app.get("/metrics")
+def metrics():
+    try:
+        sweeps = recent_sweeps(3)
+    except Exception as e:
+        sweeps = {"error": str(e)}
+    if SCHEDULER is not None:
+        scheduler = SCHEDULER.status()
+    else:
+        try:
+            scheduler = {"mode": SCHEDULER_MODE, "jobs": job_history()}
+        except Exception as e:
+            scheduler = {"mode": SCHEDULER_MODE, "error": str(e)}
+    return {"db_pool": pool_stats(), "grid_snapshot": grid_snapshot.current().info(),
+            "owm_cache": OWM_CACHE.stats(), "geocode": GEOCODER.stats(),
+            "air_quality_writes": AIR_QUALITY_WRITER.stats(), "india_sweeps": sweeps,
+            "scheduler": scheduler}
+
+
 # ============================================================
 # Geocode → Then fetch AQI
 # ============================================================
 @app.get("/aqi/location")
-def get_aqi_by_place(place: str, country: str = "India"):
-    geocode_url = (
-        "https://nominatim.openstreetmap.org/search?"
-        f"q={place}, {country}&format=json&limit=1"
-    )
-
+async def get_aqi_by_place(place: str, country: str = "India", budget_ms: Optional[int] = None):
+    # Gazetteer / cached answers skip Nominatim entirely
     try:
-        geo = requests.get(geocode_url, headers=HEADERS, timeout=8).json()
+        geo = await GEOCODER.resolve(place, country)
     except Exception as e:
         return {"error": "Geocoding failed", "detail": str(e)}
 
     if not geo:
         return {"error": "Location not found"}
 
-    lat = float(geo[0]["lat"])
-    lon = float(geo[0]["lon"])
+    lat = geo["lat"]
+    lon = geo["lon"]
 
-    return get_aqi(lat, lon)
+    return await get_aqi(lat, lon, budget_ms)
 
 
 # ============================================================
 # MAIN AQI ENDPOINT (LIVE + 3 FALLBACKS)
 # ============================================================
-@app.get("/aqi/coords")
-def get_aqi(lat: float, lon: float):
+# With a latency budget the live call and the DB fallbacks race instead of
+# running one after another; the best answer available when the budget
+# expires wins. AQI_BUDGET_MS=0 keeps the sequential chain by default.
+AQI_BUDGET_MS = int(os.getenv("AQI_BUDGET_MS", "0"))
+AQI_HEDGE_DELAY_MS = int(os.getenv("AQI_HEDGE_DELAY_MS", "0"))   # head start given to the live call
+AQI_SOURCES = ("openweather", "air_quality_cache", "india_aqi")    # preference order
 
-    # 1) LIVE API
-    live = fetch_owm(lat, lon)
-    if live and live["aqi"] is not None:
-        save_to_db(lat, lon, live)
-        live["source"] = "openweather"
-        return {**live, "latitude": lat, "longitude": lon}
+# Late live results are still persisted; keep references so the tasks aren't collected
+_background_tasks = set()
 
-    # 2) SEARCH HISTORY FALLBACK
-    h = get_latest_from_air_quality(lat, lon)
-    if h:
-        return {
-            "latitude": lat,
-            "longitude": lon,
-            "aqi": h[0],
-            "pm25": h[1],
-            "pm10": h[2],
-            "carbon_monoxide": h[3],
-            "nitrogen_dioxide": h[4],
-            "sulphur_dioxide": h[5],
-            "ozone": h[6],
-            "timestamp": h[7].isoformat(),
-            "source": "air_quality_cache"
-        }
 
-    # 3) INDIA GRID FALLBACK
-    if 6 <= lat <= 38 and 68 <= lon <= 98:
-        india = get_nearest_india_aqi(lat, lon)
-        if india:
-            india["source"] = "india_aqi"
-            return india
+def history_response(lat, lon, h):
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "aqi": h[0],
+        "pm25": h[1],
+        "pm10": h[2],
+        "carbon_monoxide": h[3],
+        "nitrogen_dioxide": h[4],
+        "sulphur_dioxide": h[5],
+        "ozone": h[6],
+        "timestamp": h[7].isoformat(),
+        "source": "air_quality_cache"
+    }
 
-    # 4) HARD FALLBACK
+
+def hard_fallback(lat, lon):
     return {
         "latitude": lat,
         "longitude": lon,
@@ -369,15 +378,284 @@ def get_aqi(lat: float, lon: float):
     }
 
 
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def resolve_hedged(lat, lon, budget_ms):
+    """
+    Race the live call against the DB fallbacks (launched AQI_HEDGE_DELAY_MS
+    later) and return the most preferred source that has answered. A source
+    only wins once every source ahead of it has finished empty-handed, or
+    the budget has expired.
+    """
+    started = time.monotonic()
+    deadline = started + budget_ms / 1000.0
+    timings = {}
+
+    async def timed(name, coro):
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            timings[name] = None    # lost the race; not a completed fetch
+            raise
+        finally:
+            timings.setdefault(name, round((time.monotonic() - started) * 1000, 1))
+
+    async def live():
+        d = await afetch_owm(lat, lon)
+        if not d or d["aqi"] is None:
+            return None
+        await save_to_db(lat, lon, d)
+        return {**d, "source": "openweather", "latitude": lat, "longitude": lon}
+
+    async def history():
+        h = await async_support.run_db(get_latest_from_air_quality, lat, lon)
+        return history_response(lat, lon, h) if h else None
+
+    async def india():
+        d = await async_support.run_db(get_nearest_india_aqi, lat, lon)
+        return {**d, "source": "india_aqi"} if d else None
+
+    async def delayed(fn):
+        await asyncio.sleep(AQI_HEDGE_DELAY_MS / 1000.0)
+        return await fn()
+
+    tasks = {"openweather": _spawn(timed("openweather", live()))}
+    tasks["air_quality_cache"] = asyncio.create_task(timed("air_quality_cache", delayed(history)))
+    if inside_india(lat, lat, lon, lon):
+        tasks["india_aqi"] = asyncio.create_task(timed("india_aqi", delayed(india)))
+
+    def pick(final):
+        """(decided, source, result); without final, stop at the first unfinished source."""
+        for name in AQI_SOURCES:
+            task = tasks.get(name)
+            if task is None:
+                continue
+            if not task.done():
+                if final:
+                    continue
+                return False, None, None
+            result = None if task.cancelled() or task.exception() else task.result()
+            if result:
+                return True, name, result
+        return True, None, None
+
+    while True:
+        decided, winner, result = pick(final=False)
+        if decided:
+            break
+        pending = [t for t in tasks.values() if not t.done()]
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            decided, winner, result = pick(final=True)
+            break
+        await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+    # The live task is left running so a late answer still fills the cache
+    cancelled = []
+    for name, task in tasks.items():
+        if name != "openweather" and not task.done():
+            task.cancel()
+            cancelled.append(name)
+
+    out = result if winner else hard_fallback(lat, lon)
+    out["resolution"] = {
+        "mode": "hedged",
+        "budget_ms": budget_ms,
+        "winner": out["source"],
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "timings_ms": {name: timings.get(name) for name in tasks if name not in cancelled},
+        "cancelled": cancelled,
+    }
+    return out
+
+
+@app.get("/aqi/coords")
+async def get_aqi(lat: float, lon: float, budget_ms: Optional[int] = None):
+    # Async handler: outbound HTTP is awaited on the shared client and
+    # blocking DB helpers run on the DB executor, so slow providers don't
+    # pin a threadpool slot per lookup.
+    budget_ms = AQI_BUDGET_MS if budget_ms is None else budget_ms
+    if budget_ms > 0:
+        return await resolve_hedged(lat, lon, budget_ms)
+
+    # 1) LIVE API
+    live = await afetch_owm(lat, lon)
+    if live and live["aqi"] is not None:
+        await save_to_db(lat, lon, live)
+        live["source"] = "openweather"
+        return {**live, "latitude": lat, "longitude": lon}
+
+    # 2) SEARCH HISTORY FALLBACK
+    h = await async_support.run_db(get_latest_from_air_quality, lat, lon)
+    if h:
+        return history_response(lat, lon, h)
+
+    # 3) INDIA GRID FALLBACK
+    if 6 <= lat <= 38 and 68 <= lon <= 98:
+        india = await async_support.run_db(get_nearest_india_aqi, lat, lon)
+        if india:
+            india["source"] = "india_aqi"
+            return india
+
+    # 4) HARD FALLBACK
+    return hard_fallback(lat, lon)
+
+
 # ============================================================
 # HEATMAP ENDPOINT
 # ============================================================
+def acquire_samples(coords, deadline_s):
+    """
+    Fetch AQI at each (lat, lon) concurrently. Whatever has arrived when the
+    deadline expires is returned; queued fetches are cancelled and in-flight
+    ones finish in the background, landing in the OpenWeather cache.
+    """
+    started = time.monotonic()
+    futures = {HEATMAP_EXECUTOR.submit(fetch_owm, a, b): (a, b) for a, b in coords}
+    done, pending = wait(futures, timeout=deadline_s)
+    for f in pending:
+        f.cancel()
+
+    samples = []
+    for f in done:
+        d = f.result()
+        if d and d["aqi"] is not None:
+            a, b = futures[f]
+            samples.append((a, b, d["aqi"]))
+
+    stats = {
+        "requested": len(coords),
+        "received": len(samples),
+        "timed_out": len(pending),
+        "acquisition_ms": round((time.monotonic() - started) * 1000, 1),
+        "deadline_s": deadline_s,
+    }
+    return samples, stats
+
+
+def inside_india(min_lat, max_lat, min_lon, max_lon):
+    lat_lo, lat_hi, lon_lo, lon_hi = INDIA_BOUNDS
+    return lat_lo <= min_lat and max_lat <= lat_hi and lon_lo <= min_lon and max_lon <= lon_hi
+
+
+def grid_samples(min_lat, max_lat, min_lon, max_lon, coords, blend_live):
+    """
+    Samples from the in-memory India grid snapshot, optionally blended with
+    OpenWeather readings already in the cache for the sample coords. Makes
+    no external calls. Returns (samples, stats), or (None, None) when the
+    snapshot has fewer than 4 usable points around the box. stats["stale"]
+    is set when the snapshot is older than HEATMAP_GRID_MAX_AGE_S.
+    """
+    started = time.monotonic()
+    snap = grid_snapshot.current()
+    m = HEATMAP_GRID_MARGIN_DEG
+    idx = snap.points_in_bbox(min_lat - m, max_lat + m, min_lon - m, max_lon + m)
+    aqi = snap.values["aqi"][idx]
+    idx = idx[~np.isnan(aqi)]
+    if len(idx) < 4:
+        return None, None
+
+    # keyed by coordinates, so a live reading replaces the grid node it lands on
+    samples = {(round(la, 6), round(lo, 6)): (la, lo, v) for la, lo, v in
+               zip(snap.lats[idx].tolist(), snap.lons[idx].tolist(), snap.values["aqi"][idx].tolist())}
+    blended = 0
+    if blend_live:
+        for a, b in coords:
+            cached = OWM_CACHE.peek(a, b, air_pollution_url())
+            if not cached:
+                continue
+            try:
+                d = parse_owm_payload(*cached)
+            except Exception:
+                d = None
+            if d and d["aqi"] is not None:
+                samples[(round(a, 6), round(b, 6))] = (a, b, d["aqi"])
+                blended += 1
+    samples = list(samples.values())
+
+    info = snap.info()
+    stats = {
+        "grid_points": int(len(idx)),
+        "live_blended": blended,
+        "received": len(samples),
+        "acquisition_ms": round((time.monotonic() - started) * 1000, 2),
+        "snapshot": info,
+        "stale": info["age_seconds"] is not None and info["age_seconds"] > HEATMAP_GRID_MAX_AGE_S,
+    }
+    return samples, stats
+
+
+def render_heatmap(grid, bounds, fmt, meta):
+    """Serialize the grid in the negotiated format (see heatmap_encoding)."""
+    min_lat, max_lat, min_lon, max_lon = bounds
+    rows, cols = grid.shape
+    if fmt == "json":
+        return {
+            "grid_lats": np.linspace(min_lat, max_lat, rows).tolist(),
+            "grid_lons": np.linspace(min_lon, max_lon, cols).tolist(),
+            "grid_aqi": grid.tolist(),
+            **meta,
+        }
+
+    started = time.perf_counter()
+    if fmt.endswith("_b64"):
+        kind = fmt[:-4]
+        encoded = heatmap_encoding.encode_b64(grid, kind)
+        return {
+            "bounds": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+            "rows": rows,
+            "cols": cols,
+            "encoding": kind,
+            "scale": heatmap_encoding.DTYPES[kind][2],
+            "grid_aqi_b64": encoded,
+            "encode_ms": round((time.perf_counter() - started) * 1000, 3),
+            **meta,
+        }
+
+    if fmt == "png":
+        body, media_type = heatmap_encoding.encode_png(grid), "image/png"
+    else:
+        body, media_type = heatmap_encoding.encode_binary(grid, bounds, fmt), "application/octet-stream"
+    headers = {
+        "X-Heatmap-Bounds": f"{min_lat},{max_lat},{min_lon},{max_lon}",
+        "X-Heatmap-Encoding": fmt,
+        "X-Heatmap-Encode-Ms": f"{(time.perf_counter() - started) * 1000:.3f}",
+        "X-Heatmap-Source": str(meta.get("source")),
+        "X-Heatmap-Samples": str(meta.get("samples", {}).get("received")),
+        "X-Heatmap-Stale": "1" if meta.get("samples", {}).get("stale") else "0",
+        "Vary": "Accept",
+    }
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @app.get("/aqi/heatmap/smooth")
-def heatmap(lat1: float, lon1: float, lat2: float, lon2: float,
-            sample_grid: int = 5, out_res: int = 80):
+def heatmap(request: Request, response: Response, lat1: float, lon1: float, lat2: float, lon2: float,
+            sample_grid: int = 5, out_res: int = 80,
+            deadline_s: float = HEATMAP_DEADLINE_S,
+            method: Optional[str] = None,
+            source: str = "auto", blend_live: bool = True,
+            format: Optional[str] = None):
 
     sample_grid = max(3, min(11, sample_grid))
     out_res = max(40, min(200, out_res))
+    deadline_s = max(0.5, min(20.0, deadline_s))
+    method = method or DEFAULT_INTERPOLATION
+    if method not in INTERPOLATION_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"method must be one of: {', '.join(INTERPOLATION_BACKENDS)}")
+    if source not in HEATMAP_SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of: {', '.join(HEATMAP_SOURCES)}")
+    try:
+        fmt = heatmap_encoding.negotiate(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The body format follows Accept, so caches must key on it (the JSON
+    # bodies included; render_heatmap sets it on the binary ones)
+    response.headers["Vary"] = "Accept"
 
     min_lat, max_lat = min(lat1, lat2), max(lat1, lat2)
     min_lon, max_lon = min(lon1, lon2), max(lon1, lon2)
@@ -386,38 +664,46 @@ def heatmap(lat1: float, lon1: float, lat2: float, lon2: float,
     lons = np.linspace(min_lon, max_lon, sample_grid)
     coords = [(a, b) for a in lats for b in lons]
 
-    samples = []
-    for a, b in coords:
-        d = fetch_owm(a, b)
-        if d and d["aqi"] is not None:
-            samples.append((a, b, d["aqi"]))
-
+    # Inside India, draw from the stored sweep grid instead of calling OpenWeather
+    samples = None
+    stale_snapshot = None
+    lattice = (lats, lons)
+    if source != "live" and inside_india(min_lat, max_lat, min_lon, max_lon):
+        samples, sample_stats = grid_samples(min_lat, max_lat, min_lon, max_lon, coords, blend_live)
+        if samples is not None and source == "auto" and sample_stats["stale"]:
+            # Sweep or snapshot reload has stalled; sample live rather than serve old data
+            samples, stale_snapshot = None, sample_stats["snapshot"]
+    if samples is not None:
+        data_source = "india_grid"
+        lattice = None  # scattered grid cells, not the request's sample lattice
+    else:
+        if source == "grid":
+            raise HTTPException(status_code=404, detail="India grid snapshot does not cover this area")
+        data_source = "openweather"
+        samples, sample_stats = acquire_samples(coords, deadline_s)
+        if stale_snapshot:
+            sample_stats["skipped_stale_snapshot"] = stale_snapshot
+
+    bounds = (min_lat, max_lat, min_lon, max_lon)
     if len(samples) < 4:
         grid = np.full((out_res, out_res), 50.0)
-        return {
-            "grid_lats": np.linspace(min_lat, max_lat, out_res).tolist(),
-            "grid_lons": np.linspace(min_lon, max_lon, out_res).tolist(),
-            "grid_aqi": grid.tolist(),
-            "note": "fallback - insufficient samples"
-        }
+        meta = {"samples": sample_stats, "source": data_source, "note": "fallback - insufficient samples"}
+        return render_heatmap(grid, bounds, fmt, meta)
 
     xs = np.array([s[1] for s in samples])
     ys = np.array([s[0] for s in samples])
     zs = np.array([s[2] for s in samples])
 
-    rbf = Rbf(xs, ys, zs, function="linear")
-
-    gx, gy = np.meshgrid(
+    grid = interpolate(
+        ys, xs, zs,
+        np.linspace(min_lat, max_lat, out_res),
         np.linspace(min_lon, max_lon, out_res),
-        np.linspace(min_lat, max_lat, out_res)
+        method=method,
+        lattice=lattice,
     )
-    smoothed = np.clip(rbf(gx, gy), 0, 500)
+    smoothed = np.clip(grid, 0, 500)
 
-    return {
-        "grid_lats": np.linspace(min_lat, max_lat, out_res).tolist(),
-        "grid_lons": np.linspace(min_lon, max_lon, out_res).tolist(),
-        "grid_aqi": smoothed.tolist()
-    }
+    return render_heatmap(smoothed, bounds, fmt, {"samples": sample_stats, "source": data_source, "method": method})
 
 
 # ============================================================
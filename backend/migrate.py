@@ -0,0 +1,41 @@
+# backend/migrate.py
+# Apply sql/migrations/*.sql in filename order, once each.
+from pathlib import Path
+from database import db_connection
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "sql" / "migrations"
+
+# Arbitrary key so concurrent workers don't apply the same migration twice
+MIGRATION_LOCK_KEY = 7231001
+
+
+def run_migrations():
+    applied = []
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+        cur.execute("SELECT name FROM schema_migrations")
+        done = {r[0] for r in cur.fetchall()}
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            if path.name in done:
+                continue
+            print(f"[MIGRATE] Applying {path.name}")
+            cur.execute(path.read_text())
+            cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (path.name,))
+            applied.append(path.name)
+        conn.commit()
+        cur.close()
+    return applied
+
+
+if __name__ == "__main__":
+    names = run_migrations()
+    print(f"[MIGRATE] {len(names)} migration(s) applied")
@@ -0,0 +1,234 @@
+# backend/owm_cache.py
+# Shared TTL + LRU cache for OpenWeather air_pollution lookups.
+#
+# Coordinates are snapped to CACHE_CELL_DEG cells, so requests a few metres
+# apart share one entry; entries are also keyed by endpoint URL, so lookups
+# against another base URL (e.g. a stub server) never share them. Concurrent misses for the same cell are collapsed
+# into a single upstream call (single-flight), for threads via
+# get_or_load() and for coroutines via aget_or_load().
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OWM_API_KEY = os.getenv("OWM_API_KEY")
+# Override OWM_BASE_URL to point lookups at a local stub server
+OWM_BASE_URL = os.getenv("OWM_BASE_URL", "http://api.openweathermap.org/data/2.5").rstrip("/")
+
+CACHE_CELL_DEG = float(os.getenv("OWM_CACHE_CELL_DEG", "0.01"))    # ~1 km cells
+CACHE_TTL = float(os.getenv("OWM_CACHE_TTL", "900"))               # seconds; OWM updates hourly
+CACHE_MAX_ENTRIES = int(os.getenv("OWM_CACHE_MAX_ENTRIES", "5000"))
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _retrieve(task):
+    """Mark a load's error retrieved when every caller has gone."""
+    if not task.cancelled():
+        task.exception()
+
+
+class GeoCache:
+    """Thread-safe cache keyed on snapped (lat, lon) with TTL and LRU bound."""
+
+    def __init__(self, cell_deg=CACHE_CELL_DEG, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}
+        self._ainflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0, "errors": 0}
+
+    def key(self, lat, lon, endpoint=None):
+        return (endpoint, round(lat / self.cell_deg), round(lon / self.cell_deg))
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def peek(self, lat, lon, endpoint=None):
+        """Cached value without loading or touching the counters."""
+        with self._lock:
+            entry = self._lookup(self.key(lat, lon, endpoint), time.monotonic())
+            return entry[1] if entry else None
+
+    def put(self, lat, lon, value, endpoint=None):
+        with self._lock:
+            self._store(self.key(lat, lon, endpoint), value)
+
+    def get_or_load(self, lat, lon, loader, endpoint=None):
+        """
+        Return the cached value for the cell, or call loader() once for all
+        concurrent callers. Loader errors are re-raised to every waiter and
+        nothing is cached.
+        """
+        key = self.key(lat, lon, endpoint)
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry:
+                self._stats["hits"] += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _InFlight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+        return flight.value
+
+    async def aget_or_load(self, lat, lon, loader, endpoint=None):
+        """
+        Async get_or_load; `loader` is a coroutine function. The load runs as
+        its own task and every caller awaits it shielded, so a cancelled
+        caller (the first one included) stops waiting without cancelling the
+        load for the others.
+        """
+        key = self.key(lat, lon, endpoint)
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry:
+                self._stats["hits"] += 1
+                return entry[1]
+            task = self._ainflight.get(key)
+            if task is None:
+                task = self._ainflight[key] = asyncio.ensure_future(self._aload(key, loader))
+                task.add_done_callback(_retrieve)
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _aload(self, key, loader):
+        try:
+            value = await loader()
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        else:
+            with self._lock:
+                self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["size"] = len(self._entries)
+        lookups = out["hits"] + out["misses"] + out["coalesced"]
+        out["hit_rate"] = round((out["hits"] + out["coalesced"]) / lookups, 4) if lookups else None
+        out["cell_deg"] = self.cell_deg
+        out["ttl_seconds"] = self.ttl
+        out["max_entries"] = self.max_entries
+        return out
+
+
+OWM_CACHE = GeoCache()
+
+
+def air_pollution_url(base_url=None):
+    """Current air_pollution endpoint; also the OWM_CACHE key scope."""
+    return f"{base_url or OWM_BASE_URL}/air_pollution"
+
+
+def fetch_air_pollution(lat, lon, session=None, timeout=8, headers=None, base_url=None, limiter=None):
+    """
+    Current air_pollution payload for (lat, lon) through OWM_CACHE.
+    Returns (payload, fetched_at) where fetched_at is when it left OpenWeather.
+    Raises on HTTP/network errors (never cached). `limiter` is acquired only
+    when the request actually goes out, so cache hits cost no tokens.
+    """
+    endpoint = air_pollution_url(base_url)
+
+    def load():
+        if limiter is not None:
+            limiter.acquire()
+        http = session or requests
+        url = f"{endpoint}?lat={lat}&lon={lon}&appid={OWM_API_KEY}"
+        r = http.get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        return r.json(), datetime.now(timezone.utc)
+
+    return OWM_CACHE.get_or_load(lat, lon, load, endpoint)
+
+
+async def afetch_air_pollution(client, lat, lon, timeout=8, headers=None, base_url=None):
+    """Async fetch_air_pollution over a shared httpx.AsyncClient."""
+    endpoint = air_pollution_url(base_url)
+
+    async def load():
+        r = await client.get(endpoint, params={"lat": lat, "lon": lon, "appid": OWM_API_KEY},
+                             headers=headers, timeout=timeout)
+        r.raise_for_status()
+        return r.json(), datetime.now(timezone.utc)
+
+    return await OWM_CACHE.aget_or_load(lat, lon, load, endpoint)
+
+
+def fetch_air_pollution_series(kind, lat, lon, start=None, end=None, session=None, timeout=15,
+                               headers=None, base_url=None):
+    """
+    Hourly air_pollution/history (start..end, unix seconds UTC) or
+    air_pollution/forecast payload. Not cached: windows rarely repeat.
+    """
+    if kind not in ("history", "forecast"):
+        raise ValueError("kind must be 'history' or 'forecast'")
+    params = {"lat": lat, "lon": lon, "appid": OWM_API_KEY}
+    if kind == "history":
+        params.update(start=int(start), end=int(end))
+    http = session or requests
+    r = http.get(f"{base_url or OWM_BASE_URL}/air_pollution/{kind}", params=params,
+                 headers=headers, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
@@ -1,42 +1,31 @@
-import requests
-from database import get_connection
+from database import db_cursor
+from owm_cache import fetch_air_pollution
 from datetime import datetime
 from dotenv import load_dotenv
-import os
 
 # Load .env
 load_dotenv()
-API_KEY = os.getenv("OWM_API_KEY")
 
 def save(lat, lon, data):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO air_quality 
-        (latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        lat, lon,
-        data["aqi"],
-        data["pm2_5"],
-        data["pm10"],
-        data["co"],
-        data["no2"],
-        data["so2"],
-        data["o3"],
-        datetime.utcnow()
-    ))
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            INSERT INTO air_quality 
+            (latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        """, (
+            lat, lon,
+            data["aqi"],
+            data["pm2_5"],
+            data["pm10"],
+            data["co"],
+            data["no2"],
+            data["so2"],
+            data["o3"],
+            datetime.utcnow()
+        ))
 
 def fetch_aqi(lat, lon):
-    url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-
-    r = requests.get(url, timeout=10)
-    js = r.json()
+    js, _ = fetch_air_pollution(lat, lon, timeout=10)
 
     comp = js["list"][0]["components"]
     aqi = js["list"][0]["main"]["aqi"]
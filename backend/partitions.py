@@ -0,0 +1,179 @@
+# backend/partitions.py
+# Range partitions for india_aqi (dt) and air_quality (timestamp).
+#
+# Partitions cover one PARTITION_INTERVAL (day or ISO week, UTC) and are
+# named <table>_p<YYYYMMDD> after their first day. ensure() creates them
+# PARTITION_AHEAD_DAYS ahead, plus any range that has rows waiting in the
+# DEFAULT partition (moved out in the same transaction). Retention detaches
+# and drops whole partitions instead of DELETEing rows, optionally writing
+# each one to PARTITION_ARCHIVE_DIR as gzipped COPY text first.
+import gzip
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from database import db_cursor
+
+PARTITION_INTERVAL = os.getenv("PARTITION_INTERVAL", "day")        # day | week
+PARTITION_AHEAD_DAYS = int(os.getenv("PARTITION_AHEAD_DAYS", "3"))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "")     # empty = drop without archiving
+
+# table -> partition column (its type, timestamp or timestamptz, is read
+# from the catalog)
+TABLES = {"india_aqi": "dt", "air_quality": "timestamp"}
+
+# Serializes partition DDL across processes
+PARTITION_LOCK_KEY = 7231004
+
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _utc_naive(text):
+    dt = datetime.fromisoformat(text)
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def range_start(dt, interval=PARTITION_INTERVAL):
+    """Start (naive UTC midnight) of the partition range holding dt."""
+    day = datetime(dt.year, dt.month, dt.day)
+    return day - timedelta(days=day.weekday()) if interval == "week" else day
+
+
+def _step(interval=PARTITION_INTERVAL):
+    return timedelta(days=7 if interval == "week" else 1)
+
+
+def _literal(dt, tz):
+    return f"'{dt:%Y-%m-%d %H:%M:%S}{'+00' if tz else ''}'"
+
+
+def _column_is_tz(cur, table, column):
+    cur.execute(
+        "SELECT atttypid = 'timestamptz'::regtype FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = %s",
+        (table, column)
+    )
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions(cur, table):
+    """[(name, start, end)] of the bounded partitions (naive UTC), oldest first."""
+    cur.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table,)
+    )
+    parts = []
+    for name, bound in cur.fetchall():
+        m = _BOUNDS.search(bound or "")
+        if m:
+            parts.append((name, _utc_naive(m.group(1)), _utc_naive(m.group(2))))
+    return sorted(parts, key=lambda p: p[1])
+
+
+def _create(cur, table, start, end, tz):
+    column = TABLES[table]
+    name = f"{table}_p{start:%Y%m%d}"
+    lo, hi = _literal(start, tz), _literal(end, tz)
+    default = f"{table}_default"
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= {lo} AND {column} < {hi})")
+    if cur.fetchone()[0]:
+        # rows for this range are parked in the default partition: move them
+        # over, then attach (attaching would otherwise fail on them)
+        cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cur.execute(f"WITH moved AS (DELETE FROM {default} WHERE {column} >= {lo} AND {column} < {hi} "
+                    f"RETURNING *) INSERT INTO {name} SELECT * FROM moved")
+        moved = cur.rowcount
+        cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})")
+        print(f"[PARTITION] Created {name}, moved {moved} rows from {default}")
+    else:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({lo}) TO ({hi})")
+        print(f"[PARTITION] Created {name}")
+    return name
+
+
+def ensure(cur, table, now=None, ahead_days=PARTITION_AHEAD_DAYS, back_days=0):
+    """
+    Create the missing partitions from back_days ago to ahead_days out, and
+    for every range with rows in the default partition. Returns created names.
+    """
+    if not is_partitioned(cur, table):
+        return []
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_KEY,))
+    column = TABLES[table]
+    tz = _column_is_tz(cur, table, column)
+    now = now or datetime.utcnow()
+    step = _step()
+    wanted = set()
+    start = range_start(now - timedelta(days=back_days))
+    while start <= now + timedelta(days=ahead_days):
+        wanted.add(start)
+        start += step
+    utc = f"{column} AT TIME ZONE 'UTC'" if tz else column
+    cur.execute(f"SELECT DISTINCT date_trunc('day', {utc}) FROM {table}_default")
+    wanted.update(range_start(r[0]) for r in cur.fetchall())
+
+    existing = list_partitions(cur, table)
+    created = []
+    for start in sorted(wanted):
+        end = start + step
+        if any(s < end and start < e for _, s, e in existing):
+            continue     # covered (or overlapped after an interval change)
+        created.append(_create(cur, table, start, end, tz))
+        existing.append((created[-1], start, end))
+    return created
+
+
+def _archive(cur, name, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.tsv.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        cur.copy_expert(f"COPY {name} TO STDOUT", f)
+    return path
+
+
+def drop_expired(cur, table, cutoff, archive_dir=PARTITION_ARCHIVE_DIR):
+    """
+    Detach, optionally archive, and drop the partitions entirely older than
+    cutoff (naive UTC); stray default-partition rows are deleted. Returns
+    (partitions dropped, default rows deleted). Non-partitioned tables fall
+    back to a plain DELETE.
+    """
+    column = TABLES[table]
+    tz = _column_is_tz(cur, table, column)
+    if not is_partitioned(cur, table):
+        cur.execute(f"DELETE FROM {table} WHERE {column} < {_literal(cutoff, tz)}")
+        return 0, cur.rowcount
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_KEY,))
+    dropped = 0
+    for name, start, end in list_partitions(cur, table):
+        if end > cutoff:
+            break
+        cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        if archive_dir:
+            print(f"[PARTITION] Archived {name} to {_archive(cur, name, archive_dir)}")
+        cur.execute(f"DROP TABLE {name}")
+        dropped += 1
+        print(f"[PARTITION] Dropped {name}")
+    cur.execute(f"DELETE FROM {table}_default WHERE {column} < {_literal(cutoff, tz)}")
+    return dropped, cur.rowcount
+
+
+def ensure_all(now=None, tables=TABLES, back_days=0):
+    """ensure() each partitioned table, one transaction each; returns created names."""
+    created = []
+    for table in tables:
+        try:
+            with db_cursor(commit=True) as cur:
+                created += ensure(cur, table, now, back_days=back_days)
+        except Exception as e:
+            print(f"[PARTITION ERROR] {table}: {e}")
+    return created
@@ -0,0 +1,74 @@
+# backend/rolling.py
+# NaN-aware window aggregations over 1-D float arrays for the history
+# timeseries. Missing values are NaN; a window with no valid values gives
+# NaN. Windows are trailing: element i covers [i - window + 1, i].
+import warnings
+import numpy as np
+
+
+def rolling_mean(values, window):
+    """Mean of the valid values in each trailing window, from running sums (O(n))."""
+    x = np.asarray(values, dtype=float)
+    valid = ~np.isnan(x)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    lo = np.maximum(np.arange(1, len(x) + 1) - window, 0)
+    s = sums[1:] - sums[lo]
+    n = counts[1:] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, s / n, np.nan)
+
+
+def _windows(x, window, fill):
+    """(n, window) strided view of x, left-padded so every row is a full window."""
+    padded = np.concatenate((np.full(window - 1, fill), np.where(np.isnan(x), fill, x)))
+    return np.lib.stride_tricks.sliding_window_view(padded, window)
+
+
+def rolling_max(values, window):
+    """Largest valid value in each trailing window."""
+    x = np.asarray(values, dtype=float)
+    if not len(x):
+        return x
+    out = _windows(x, window, -np.inf).max(axis=1)
+    return np.where(np.isneginf(out), np.nan, out)
+
+
+def rolling_percentile(values, window, q):
+    """q-th percentile (0-100) of the valid values in each trailing window."""
+    x = np.asarray(values, dtype=float)
+    if not len(x):
+        return x
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN windows
+        return np.nanpercentile(_windows(x, window, np.nan), q, axis=1)
+
+
+def ewma(values, span):
+    """
+    Exponentially weighted mean with alpha = 2 / (span + 1); NaNs hold the
+    previous value. One sequential pass, the recurrence doesn't vectorize.
+    """
+    x = np.asarray(values, dtype=float)
+    out = np.full(len(x), np.nan)
+    alpha = 2.0 / (span + 1.0)
+    acc = np.nan
+    for i, v in enumerate(x.tolist()):
+        if v == v:
+            acc = v if acc != acc else acc + alpha * (v - acc)
+        out[i] = acc
+    return out
+
+
+def percentiles(values, qs):
+    """{q: percentile} of the valid values (None when there are none)."""
+    x = np.asarray(values, dtype=float)
+    x = x[~np.isnan(x)]
+    if not len(x):
+        return {q: None for q in qs}
+    return dict(zip(qs, np.percentile(x, qs).tolist()))
+
+
+def to_json(values):
+    """Plain list with NaN as None."""
+    return [None if v != v else v for v in np.asarray(values, dtype=float).tolist()]
@@ -0,0 +1,176 @@
+# backend/rollups.py
+# Hourly and daily per-cell rollups of india_aqi (sql/migrations/006).
+#
+# Rows are rolled up in the transaction that merges them, from the rows
+# the merge actually inserted, so re-merged duplicates never count twice.
+# History endpoints then read one row per cell and bucket instead of the
+# raw readings. The daily rollup outlives the raw rows
+# (ROLLUP_DAILY_RETENTION_DAYS), so long windows still have data.
+import math
+import os
+from datetime import datetime, timedelta
+import numpy as np
+
+METRICS = ("aqi", "pm25", "pm10", "no2", "so2", "o3", "co")
+TABLES = {"hourly": ("india_aqi_hourly", "hour"), "daily": ("india_aqi_daily", "day")}
+
+HOURLY_RETENTION_DAYS = int(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", "30"))
+DAILY_RETENTION_DAYS = int(os.getenv("ROLLUP_DAILY_RETENTION_DAYS", "400"))
+
+_PARTS = ("n", "sum", "sq", "min", "max")
+_COLUMNS = ["n"] + [f"{m}_{p}" for m in METRICS for p in _PARTS]
+_STAT_KEYS = ("count", "mean", "median", "std", "min", "max")
+_STAT_KEYS_NO_MEDIAN = ("count", "mean", "std", "min", "max")
+
+
+def _upsert_sql(table, unit, source):
+    aggs = ", ".join(
+        f"COUNT({m}), COALESCE(SUM({m}), 0), COALESCE(SUM({m}::float8 * {m}), 0), MIN({m}), MAX({m})"
+        for m in METRICS
+    )
+    merge = []
+    for c in _COLUMNS:
+        if c.endswith("_min"):
+            merge.append(f"{c} = LEAST(t.{c}, EXCLUDED.{c})")        # LEAST/GREATEST skip NULLs
+        elif c.endswith("_max"):
+            merge.append(f"{c} = GREATEST(t.{c}, EXCLUDED.{c})")
+        else:
+            merge.append(f"{c} = t.{c} + EXCLUDED.{c}")
+    return f"""
+        INSERT INTO {table} AS t (lat, lon, bucket, {', '.join(_COLUMNS)})
+        SELECT lat, lon, date_trunc('{unit}', dt), COUNT(*), {aggs}
+        FROM {source} GROUP BY 1, 2, 3
+        ON CONFLICT (lat, lon, bucket) DO UPDATE SET {', '.join(merge)}
+    """
+
+
+def apply(cur, source):
+    """Add the india_aqi-shaped rows in relation `source` to every rollup."""
+    for table, unit in TABLES.values():
+        cur.execute(_upsert_sql(table, unit, source))
+
+
+def prune(cur, now=None):
+    """Drop rollup buckets past their retention; returns rows deleted per rollup."""
+    now = now or datetime.utcnow()
+    deleted = {}
+    for name, days in (("hourly", HOURLY_RETENTION_DAYS), ("daily", DAILY_RETENTION_DAYS)):
+        cur.execute(f"DELETE FROM {TABLES[name][0]} WHERE bucket < %s", (now - timedelta(days=days),))
+        deleted[name] = cur.rowcount
+    return deleted
+
+
+def granularity_for(days):
+    """Finest rollup that still covers a `days` window."""
+    return "hourly" if days <= HOURLY_RETENTION_DAYS else "daily"
+
+
+def _cells_join(cells):
+    """
+    Join restricting a rollup to `cells`, each (lat, lon) or (lat, lon,
+    weight); exposes the weight as c.w (1 when not given).
+    """
+    cols = [[float(c[0]) for c in cells], [float(c[1]) for c in cells],
+            [float(c[2]) if len(c) > 2 else 1.0 for c in cells]]
+    return "JOIN unnest(%s::float8[], %s::float8[], %s::float8[]) AS c(lat, lon, w) USING (lat, lon)", cols
+
+
+def _agg_select():
+    cols = ["SUM(n)"]
+    for m in METRICS:
+        cols += [f"SUM({m}_n)", f"SUM(c.w * {m}_n)", f"SUM(c.w * {m}_sum)", f"SUM(c.w * {m}_sq)",
+                 f"MIN({m}_min)", f"MAX({m}_max)"]
+    return ", ".join(cols)
+
+
+_PER_METRIC = 6
+
+
+def _stats(values, medians=None):
+    """
+    {metric: {count, mean, [median,] std, min, max}} from one aggregated
+    rollup row; mean and std are weighted by the cell weights.
+    """
+    out = {}
+    for i, m in enumerate(METRICS):
+        n, wn, total, sq, lo, hi = values[_PER_METRIC * i:_PER_METRIC * (i + 1)]
+        n = int(n or 0)
+        stats = dict.fromkeys(_STAT_KEYS if medians is not None else _STAT_KEYS_NO_MEDIAN)
+        stats["count"] = n
+        if n and wn:
+            mean = total / wn
+            stats.update(
+                mean=float(mean),
+                std=float(math.sqrt(max(sq / wn - mean * mean, 0.0))),   # population std, as before
+                min=float(lo),
+                max=float(hi),
+            )
+            if medians is not None and medians[i] is not None:
+                stats["median"] = float(medians[i])
+        out[m] = stats
+    return out
+
+
+def series(cur, cells, since, granularity="hourly"):
+    """
+    Per-bucket stats over `cells` since `since` (naive UTC), oldest first:
+    [(bucket, readings, {metric: stats})]. Buckets of several cells are
+    pooled, means weighted by readings times cell weight.
+    """
+    table = TABLES[granularity][0]
+    join, params = _cells_join(cells)
+    cur.execute(
+        f"""
+        SELECT bucket, {_agg_select()} FROM {table} {join}
+        WHERE bucket >= date_trunc(%s, %s::timestamp)
+        GROUP BY bucket ORDER BY bucket
+        """,
+        params + [TABLES[granularity][1], since]
+    )
+    return [(r[0], int(r[1]), _stats(r[2:])) for r in cur.fetchall()]
+
+
+def columns(cur, cells, since, granularity="hourly"):
+    """
+    Per-bucket pooled means over `cells` since `since`, column-wise:
+    (buckets, readings array, {metric: float array}), NaN where a bucket has
+    no value. Means (weighted as in series) are divided out in SQL, so
+    each bucket is one short row.
+    """
+    table = TABLES[granularity][0]
+    join, params = _cells_join(cells)
+    means = ", ".join(f"SUM(c.w * {m}_sum) / NULLIF(SUM(c.w * {m}_n), 0)" for m in METRICS)
+    cur.execute(
+        f"""
+        SELECT bucket, SUM(n), {means} FROM {table} {join}
+        WHERE bucket >= date_trunc(%s, %s::timestamp)
+        GROUP BY bucket ORDER BY bucket
+        """,
+        params + [TABLES[granularity][1], since]
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return [], np.zeros(0, dtype=np.int64), {m: np.zeros(0) for m in METRICS}
+    cols = list(zip(*rows))
+    return (list(cols[0]), np.array(cols[1], dtype=np.int64),
+            {m: np.array(cols[2 + i], dtype=float) for i, m in enumerate(METRICS)})
+
+
+def totals(cur, cells, since, granularity="daily"):
+    """
+    Stats over the whole window as (readings, {metric: stats}), in one
+    statement. The median is that of the per-cell bucket means (unweighted).
+    """
+    table = TABLES[granularity][0]
+    join, params = _cells_join(cells)
+    medians = ", ".join(f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {m}_sum / NULLIF({m}_n, 0))" for m in METRICS)
+    cur.execute(
+        f"""
+        SELECT {_agg_select()}, {medians} FROM {table} {join}
+        WHERE bucket >= date_trunc(%s, %s::timestamp)
+        """,
+        params + [TABLES[granularity][1], since]
+    )
+    row = cur.fetchone()
+    k = 1 + _PER_METRIC * len(METRICS)
+    return int(row[0] or 0), _stats(row[1:k], row[k:])
@@ -0,0 +1,360 @@
+# backend/scheduler.py
+# Cron-style job scheduler with Postgres leader election.
+#
+# Every process may run a Scheduler, but only the one holding the session
+# advisory lock SCHEDULER_LOCK_KEY (on a dedicated connection) executes
+# jobs; the others retry the lock every tick, so a replacement leader
+# takes over when the current one exits or loses its connection.
+#
+# Jobs run one at a time on the scheduler thread, so a long sweep can't
+# overlap the cleanup. Each job's last completed cron slot is stored in
+# scheduler_jobs: a slot that came due while no leader was running (or
+# while another job ran) is caught up once, if it is no older than
+# SCHEDULER_CATCHUP_HOURS.
+#
+# SCHEDULER_MODE decides where the leader candidates live: "inprocess" runs
+# one in every web worker, "worker" leaves the jobs to india_scheduler.py
+# (the web app only reads their results), "off" runs no jobs anywhere.
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+import pytz
+from database import db_cursor, get_connection
+
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "inprocess")   # inprocess | worker | off
+SCHEDULER_TZ = os.getenv("SCHEDULER_TZ", "Asia/Kolkata")
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+SCHEDULER_CATCHUP_HOURS = float(os.getenv("SCHEDULER_CATCHUP_HOURS", "12"))
+SCHEDULER_LOCK_KEY = 7231003
+
+# Default job specs (minute hour day-of-month month day-of-week, SCHEDULER_TZ)
+SCHEDULE_INDIA_SWEEP = os.getenv("SCHEDULE_INDIA_SWEEP", "35 0,12 * * *")
+SCHEDULE_CLEANUP = os.getenv("SCHEDULE_CLEANUP", "0 0 * * *")
+
+_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 6))
+
+
+class CronSpec:
+    """
+    Five-field cron expression: numbers, '*', lists (a,b), ranges (a-b) and
+    steps (*/n, a-b/n). Weekday 0 or 7 is Sunday. As in cron, when both day
+    fields are restricted a day matches if either does.
+    """
+
+    def __init__(self, expr):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron spec needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.sets = {}
+        for text, (name, lo, hi) in zip(parts, _FIELDS):
+            self.sets[name] = self._parse(text, lo, 7 if name == "weekday" else hi, name)
+        self.sets["weekday"] = {d % 7 for d in self.sets["weekday"]}
+        self.day_any = parts[2] == "*"
+        self.weekday_any = parts[4] == "*"
+
+    @staticmethod
+    def _parse(text, lo, hi, name):
+        out = set()
+        for item in text.split(","):
+            rng, _, step = item.partition("/")
+            step = int(step) if step else 1
+            if rng == "*":
+                start, end = lo, hi
+            elif "-" in rng:
+                start, end = (int(v) for v in rng.split("-", 1))
+            else:
+                start = end = int(rng)
+            if start < lo or end > hi or start > end or step < 1:
+                raise ValueError(f"bad {name} field: {item!r}")
+            out.update(range(start, end + 1, step))
+        return out
+
+    def _day_ok(self, dt):
+        day = dt.day in self.sets["day"]
+        weekday = (dt.weekday() + 1) % 7 in self.sets["weekday"]   # cron: 0 = Sunday
+        if self.day_any or self.weekday_any:
+            return day and weekday
+        return day or weekday
+
+    def _search(self, dt, direction):
+        """First matching minute from dt (inclusive) stepping in `direction` (+1/-1)."""
+        dt = dt.replace(second=0, microsecond=0)
+        for _ in range(200_000):
+            if dt.month not in self.sets["month"] or not self._day_ok(dt):
+                if direction > 0:
+                    dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                else:
+                    dt = dt.replace(hour=23, minute=59) - timedelta(days=1)
+            elif dt.hour not in self.sets["hour"]:
+                if direction > 0:
+                    dt = (dt + timedelta(hours=1)).replace(minute=0)
+                else:
+                    dt = dt.replace(minute=59) - timedelta(hours=1)
+            elif dt.minute not in self.sets["minute"]:
+                dt += timedelta(minutes=direction)
+            else:
+                return dt
+        raise ValueError(f"cron spec {self.expr!r} never fires")
+
+    def next_after(self, dt):
+        """Next fire time strictly after naive local dt."""
+        return self._search(dt.replace(second=0, microsecond=0) + timedelta(minutes=1), 1)
+
+    def last_at_or_before(self, dt):
+        """Most recent fire time at or before naive local dt."""
+        return self._search(dt, -1)
+
+
+class Job:
+    def __init__(self, name, spec, fn):
+        self.name = name
+        self.spec = CronSpec(spec)
+        self.fn = fn
+        self.last_slot = None          # aware UTC datetime of the last completed slot
+        self.state = {}
+
+
+class Scheduler:
+    def __init__(self, tz=SCHEDULER_TZ, tick=SCHEDULER_TICK_SECONDS,
+                 catch_up_hours=SCHEDULER_CATCHUP_HOURS, lock_key=SCHEDULER_LOCK_KEY):
+        self.tz = pytz.timezone(tz)
+        self.tick = tick
+        self.catch_up = timedelta(hours=catch_up_hours)
+        self.lock_key = lock_key
+        self.jobs = []
+        self.leader = False
+        self.running_job = None
+        self._lock_conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, spec, fn):
+        self.jobs.append(Job(name, spec, fn))
+        return self
+
+    # ---- time helpers (cron specs are in local time, slots stored in UTC) ----
+    def _local(self, utc_dt):
+        return utc_dt.astimezone(self.tz).replace(tzinfo=None)
+
+    def _utc(self, local_dt):
+        return self.tz.localize(local_dt, is_dst=False).astimezone(timezone.utc)
+
+    def due_slot(self, job, now):
+        """Latest slot at or before now that the job hasn't run, or None."""
+        slot = self._utc(job.spec.last_at_or_before(self._local(now)))
+        if job.last_slot is not None and slot <= job.last_slot:
+            return None
+        return slot
+
+    def next_fire(self, job, now):
+        return self._utc(job.spec.next_after(self._local(now)))
+
+    # ---- leadership ----
+    def _try_lead(self):
+        """Hold (or try to take) the advisory lock; returns leadership."""
+        try:
+            if self._lock_conn is None or self._lock_conn.closed:
+                self._lock_conn = get_connection()
+                self._lock_conn.autocommit = True
+                self.leader = False
+            with self._lock_conn.cursor() as cur:
+                if self.leader:
+                    cur.execute("SELECT 1")       # lock lives as long as the session
+                else:
+                    cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+                    self.leader = bool(cur.fetchone()[0])
+                    if self.leader:
+                        print("[SCHEDULER] Became leader")
+                        self._load_state()
+        except Exception as e:
+            if self.leader:
+                print(f"[SCHEDULER] Lost leadership: {e}")
+            self.leader = False
+            try:
+                if self._lock_conn is not None:
+                    self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
+        return self.leader
+
+    def _release(self):
+        if self._lock_conn is not None and not self._lock_conn.closed:
+            try:
+                with self._lock_conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.lock_key,))
+            finally:
+                self._lock_conn.close()
+        self._lock_conn = None
+        self.leader = False
+
+    # ---- persisted job state ----
+    def _load_state(self):
+        with db_cursor() as cur:
+            cur.execute("SELECT name, last_slot FROM scheduler_jobs")
+            slots = dict(cur.fetchall())
+        now = datetime.now(timezone.utc)
+        for job in self.jobs:
+            job.last_slot = slots.get(job.name)
+            if job.last_slot is None:
+                # Never run anywhere: start from the previous slot, so a fresh
+                # deployment runs it once if that slot is within the catch-up window
+                prev = self.due_slot(job, now)
+                job.last_slot = prev - timedelta(seconds=1) if prev else None
+
+    def _record(self, job, slot, **fields):
+        cols = ["last_slot"] + list(fields)
+        vals = [slot] + list(fields.values())
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols)
+        counters = ""
+        if fields.get("last_status") in ("ok", "error"):
+            counters = ", runs = scheduler_jobs.runs + 1"
+            if fields["last_status"] == "error":
+                counters += ", failures = scheduler_jobs.failures + 1"
+        with db_cursor(commit=True) as cur:
+            cur.execute(
+                f"""
+                INSERT INTO scheduler_jobs (name, {', '.join(cols)}) VALUES (%s, {', '.join(['%s'] * len(cols))})
+                ON CONFLICT (name) DO UPDATE SET {sets}{counters}
+                """,
+                [job.name] + vals
+            )
+
+    # ---- execution ----
+    def _run(self, job, slot, now):
+        if now - slot > self.catch_up:
+            print(f"[SCHEDULER] {job.name}: slot {slot.isoformat()} too old to catch up, skipping")
+            job.last_slot = slot
+            job.state.update(last_status="skipped")
+            self._record(job, slot, last_status="skipped")
+            return
+
+        late = (now - slot).total_seconds()
+        print(f"[SCHEDULER] {job.name}: running slot {self._local(slot):%Y-%m-%d %H:%M} "
+              f"({self.tz.zone}){f', {late:.0f}s late' if late > 60 else ''}")
+        started = datetime.now(timezone.utc)
+        self.running_job = job.name
+        self._record(job, job.last_slot, last_started_at=started, last_status="running")
+        t0 = time.monotonic()
+        status, error = "ok", None
+        try:
+            job.fn()
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            self.running_job = None
+        duration = round(time.monotonic() - t0, 2)
+        finished = datetime.now(timezone.utc)
+
+        # The slot counts as done even on error; the next slot retries
+        job.last_slot = slot
+        job.state.update(last_started_at=started.isoformat(), last_finished_at=finished.isoformat(),
+                         last_duration_s=duration, last_status=status, last_error=error)
+        if status == "ok":
+            job.state["last_success_at"] = finished.isoformat()
+        fields = dict(last_finished_at=finished, last_duration_s=duration, last_status=status, last_error=error)
+        if status == "ok":
+            fields["last_success_at"] = finished
+        try:
+            self._record(job, slot, **fields)
+        except Exception as e:
+            print(f"[SCHEDULER] {job.name}: could not record run: {e}")
+        print(f"[SCHEDULER] {job.name}: {status} in {duration}s" + (f" ({error})" if error else ""))
+
+    def run_pending(self):
+        """Run every due job once (leader only). Returns the number run."""
+        ran = 0
+        for job in self.jobs:
+            if self._stop.is_set() or not self._try_lead():
+                break
+            now = datetime.now(timezone.utc)
+            slot = self.due_slot(job, now)
+            if slot is not None:
+                self._run(job, slot, now)
+                ran += 1
+        return ran
+
+    def _sleep_seconds(self):
+        now = datetime.now(timezone.utc)
+        wake = min(self.next_fire(job, now) for job in self.jobs) if self.jobs else now
+        return max(1.0, min(self.tick, (wake - now).total_seconds()))
+
+    def run_forever(self):
+        names = ", ".join(f"{j.name} [{j.spec.expr}]" for j in self.jobs)
+        print(f"[SCHEDULER] Started ({self.tz.zone}): {names}")
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._try_lead():
+                        self.run_pending()
+                except Exception as e:
+                    print(f"[SCHEDULER ERROR] {e}")
+                self._stop.wait(self._sleep_seconds())
+        finally:
+            self._release()
+
+    def start(self):
+        """run_forever on a daemon thread."""
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name="scheduler")
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        now = datetime.now(timezone.utc)
+        return {
+            "leader": self.leader,
+            "running": self.running_job,
+            "timezone": self.tz.zone,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "spec": job.spec.expr,
+                    "next_run": self.next_fire(job, now).isoformat(),
+                    "last_slot": job.last_slot.isoformat() if job.last_slot else None,
+                    **job.state,
+                }
+                for job in self.jobs
+            ],
+        }
+
+
+def job_history():
+    """Per-job run history from scheduler_jobs, whichever process ran them."""
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            SELECT name, last_slot, last_started_at, last_finished_at, last_success_at,
+                   last_duration_s, last_status, last_error, runs, failures
+            FROM scheduler_jobs ORDER BY name
+            """
+        )
+        rows = cur.fetchall()
+    return [
+        {
+            "name": r[0],
+            **{k: v.isoformat() if v else None for k, v in
+               zip(("last_slot", "last_started_at", "last_finished_at", "last_success_at"), r[1:5])},
+            "last_duration_s": r[5], "last_status": r[6], "last_error": r[7],
+            "runs": r[8], "failures": r[9],
+        }
+        for r in rows
+    ]
+
+
+def default_scheduler():
+    """The India sweep and retention cleanup on their configured specs."""
+    from fetch_india_aqi import run_india_update
+    from database import cleanup_old_records
+
+    return (Scheduler()
+            .add("india_sweep", SCHEDULE_INDIA_SWEEP, run_india_update)
+            .add("cleanup", SCHEDULE_CLEANUP, cleanup_old_records))
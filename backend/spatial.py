@@ -0,0 +1,97 @@
+# backend/spatial.py
+# Great-circle helpers and index-driven nearest-cell lookups
+import math
+from psycopg2.extras import execute_values
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+# Great-circle distance in SQL. Placeholders, in order: lat, lat, lon.
+HAVERSINE_SQL = (
+    "2 * 6371.0088 * ASIN(SQRT(LEAST(1.0, "
+    "POWER(SIN(RADIANS({lat} - %s) / 2), 2) + "
+    "COS(RADIANS(%s)) * COS(RADIANS({lat})) * "
+    "POWER(SIN(RADIANS({lon} - %s) / 2), 2))))"
+)
+
+
+def haversine_sql(lat_col, lon_col):
+    return HAVERSINE_SQL.format(lat=lat_col, lon=lon_col)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bbox_for_radius(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle of radius_km."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    coslat = math.cos(math.radians(min(89.0, abs(lat) + dlat)))
+    dlon = min(180.0, radius_km / (KM_PER_DEG_LAT * max(coslat, 1e-6)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+# ---------------------------
+# india_aqi grid cells
+# ---------------------------
+# Search radii tried in turn: one grid step first, wider if cells are missing.
+NEAREST_CELL_SEARCH_KM = (160.0, 400.0)
+
+
+def nearest_india_cells(cur, lat, lon, radius_km, limit=None):
+    """
+    Grid cells within radius_km of (lat, lon), nearest first, as
+    [(lat, lon, distance_km, latest_dt)]. Reads the small india_aqi_cells
+    table via its (lat, lon) primary key, never the full history.
+    """
+    min_lat, max_lat, min_lon, max_lon = bbox_for_radius(lat, lon, radius_km)
+    dist = haversine_sql("lat", "lon")
+    query = f"""
+        SELECT lat, lon, dist_km, latest_dt FROM (
+            SELECT lat, lon, latest_dt, {dist} AS dist_km
+            FROM india_aqi_cells
+            WHERE lat BETWEEN %s AND %s
+              AND lon BETWEEN %s AND %s
+        ) c
+        WHERE dist_km <= %s
+        ORDER BY dist_km ASC
+    """
+    params = [lat, lat, lon, min_lat, max_lat, min_lon, max_lon, radius_km]
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def nearest_india_cell(cur, lat, lon):
+    """Nearest grid cell as (lat, lon, distance_km, latest_dt), or None."""
+    for radius_km in NEAREST_CELL_SEARCH_KM:
+        cells = nearest_india_cells(cur, lat, lon, radius_km, limit=1)
+        if cells:
+            return cells[0]
+    return None
+
+
+def upsert_india_cells(cur, rows):
+    """Record the cells (and newest dt) touched by india_aqi rows (lat, lon, dt, ...)."""
+    latest = {}
+    for row in rows:
+        key = (row[0], row[1])
+        if key not in latest or row[2] > latest[key]:
+            latest[key] = row[2]
+    if not latest:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO india_aqi_cells (lat, lon, latest_dt) VALUES %s
+        ON CONFLICT (lat, lon) DO UPDATE
+        SET latest_dt = GREATEST(india_aqi_cells.latest_dt, EXCLUDED.latest_dt)
+        """,
+        [(la, lo, dt) for (la, lo), dt in latest.items()],
+    )
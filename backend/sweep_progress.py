@@ -0,0 +1,187 @@
+# backend/sweep_progress.py
+# Chunked persistence and resumable progress for India grid sweeps.
+#
+# A SweepRecorder buffers fetched rows and flushes them every FLUSH_ROWS
+# points or FLUSH_SECONDS, in one transaction together with the points
+# they came from and the sweep's counters. begin() picks up the newest
+# unfinished sweep (interrupted, or 'running' with a stale heartbeat after
+# a crash) so only the points it hasn't completed are fetched again.
+import json
+import os
+import time
+from psycopg2.extras import execute_values
+import grid_snapshot
+from database import db_cursor
+
+FLUSH_ROWS = int(os.getenv("INDIA_SWEEP_FLUSH_ROWS", "100"))
+FLUSH_SECONDS = float(os.getenv("INDIA_SWEEP_FLUSH_SECONDS", "30"))
+FLUSH_MAX_ROWS = int(os.getenv("INDIA_SWEEP_FLUSH_MAX_ROWS", "20000"))  # history/forecast chunks are large
+RESUME_HOURS = float(os.getenv("INDIA_SWEEP_RESUME_HOURS", "6"))     # older unfinished sweeps are abandoned
+STALE_SECONDS = float(os.getenv("INDIA_SWEEP_STALE_SECONDS", "300"))  # no heartbeat for this long = interrupted
+
+# Serializes begin() across processes
+SWEEP_LOCK_KEY = 7231002
+
+
+class SweepInProgress(RuntimeError):
+    """Another process is still heartbeating an unfinished sweep."""
+
+
+def begin(points_total):
+    """
+    Start a sweep or resume an interrupted one.
+    Returns (sweep_id, completed_points, resumed).
+    """
+    with db_cursor(commit=True) as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (SWEEP_LOCK_KEY,))
+        cur.execute(
+            """
+            UPDATE india_sweeps SET status = 'abandoned', finished_at = now()
+            WHERE status IN ('running', 'interrupted') AND started_at < now() - make_interval(secs => %s)
+            """,
+            (RESUME_HOURS * 3600,)
+        )
+        cur.execute(
+            """
+            SELECT id, status, EXTRACT(EPOCH FROM now() - heartbeat_at) FROM india_sweeps
+            WHERE status IN ('running', 'interrupted') ORDER BY started_at DESC LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+        if row and row[1] == 'running' and row[2] < STALE_SECONDS:
+            raise SweepInProgress(f"sweep {row[0]} heartbeat {row[2]:.0f}s ago")
+
+        if row:
+            sweep_id = row[0]
+            cur.execute(
+                """
+                UPDATE india_sweeps
+                SET status = 'running', resumes = resumes + 1, heartbeat_at = now(), points_total = %s
+                WHERE id = %s
+                """,
+                (points_total, sweep_id)
+            )
+            cur.execute("SELECT lat, lon FROM india_sweep_points WHERE sweep_id = %s AND ok", (sweep_id,))
+            return sweep_id, {(r[0], r[1]) for r in cur.fetchall()}, True
+
+        cur.execute("INSERT INTO india_sweeps (points_total) VALUES (%s) RETURNING id", (points_total,))
+        return cur.fetchone()[0], set(), False
+
+
+class SweepRecorder:
+    """
+    Collects sweep results and writes them in chunks. `write(cur, rows)`
+    persists observation rows and returns (inserted, skipped);
+    `write_forecast(cur, rows)` does the same for forecast rows.
+    """
+
+    def __init__(self, sweep_id, write, write_forecast=None, flush_rows=FLUSH_ROWS,
+                 flush_seconds=FLUSH_SECONDS, flush_max_rows=FLUSH_MAX_ROWS):
+        self.sweep_id = sweep_id
+        self._write = write
+        self._write_forecast = write_forecast
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.flush_max_rows = flush_max_rows
+        self._rows = []
+        self._forecast = []
+        self._points = []               # (sweep_id, lat, lon, ok)
+        self._last_flush = time.monotonic()
+        self.stats = {"ok": 0, "failed": 0, "inserted": 0, "skipped": 0, "forecast": 0, "flushes": 0}
+
+    def add(self, lat, lon, rows, forecast=None):
+        """Record one point's rows; rows None means the fetch failed."""
+        ok = rows is not None
+        if ok:
+            self._rows.extend(rows)
+            self._forecast.extend(forecast or ())
+        self._points.append((self.sweep_id, lat, lon, ok))
+        self.stats["ok" if ok else "failed"] += 1
+        if (len(self._points) >= self.flush_rows
+                or len(self._rows) + len(self._forecast) >= self.flush_max_rows
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                # keep the chunk buffered; it goes out with the next flush
+                print(f"[SWEEP {self.sweep_id}] flush failed, will retry: {e}")
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._points:
+            return
+        with db_cursor(commit=True) as cur:
+            inserted, skipped = self._write(cur, self._rows) if self._rows else (0, 0)
+            forecast = self._write_forecast(cur, self._forecast)[0] if self._forecast else 0
+            execute_values(
+                cur,
+                """
+                INSERT INTO india_sweep_points (sweep_id, lat, lon, ok) VALUES %s
+                ON CONFLICT (sweep_id, lat, lon) DO UPDATE SET ok = india_sweep_points.ok OR EXCLUDED.ok
+                """,
+                self._points,
+            )
+            cur.execute(
+                """
+                UPDATE india_sweeps s SET
+                  heartbeat_at = now(),
+                  rows_inserted = rows_inserted + %s,
+                  rows_skipped = rows_skipped + %s,
+                  points_ok = p.ok,
+                  points_failed = p.failed
+                FROM (SELECT COUNT(*) FILTER (WHERE ok) AS ok, COUNT(*) FILTER (WHERE NOT ok) AS failed
+                      FROM india_sweep_points WHERE sweep_id = %s) p
+                WHERE s.id = %s
+                """,
+                (inserted, skipped, self.sweep_id, self.sweep_id)
+            )
+        self.stats["inserted"] += inserted
+        self.stats["skipped"] += skipped
+        self.stats["forecast"] += forecast
+        self.stats["flushes"] += 1
+        self._rows, self._forecast, self._points = [], [], []
+
+    def finish(self):
+        """Flush what's left and close the sweep."""
+        self.flush()
+        with db_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE india_sweeps SET status = 'completed', finished_at = now(), heartbeat_at = now() WHERE id = %s",
+                (self.sweep_id,)
+            )
+            grid_snapshot.notify(cur, json.dumps({"sweep_id": self.sweep_id, **self.stats}))
+
+    def interrupt(self):
+        """Flush what we can and leave the sweep resumable by the next run."""
+        try:
+            self.flush()
+            with db_cursor(commit=True) as cur:
+                cur.execute("UPDATE india_sweeps SET status = 'interrupted' WHERE id = %s", (self.sweep_id,))
+        except Exception as e:
+            # still resumable once the heartbeat goes stale
+            print(f"[SWEEP {self.sweep_id}] could not record interruption: {e}")
+
+
+def recent_sweeps(limit=5):
+    """Newest sweeps with their counters, for /metrics."""
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, status, started_at, finished_at, points_total, points_ok, points_failed,
+                   rows_inserted, rows_skipped, resumes,
+                   EXTRACT(EPOCH FROM COALESCE(finished_at, heartbeat_at) - started_at)
+            FROM india_sweeps ORDER BY started_at DESC LIMIT %s
+            """,
+            (limit,)
+        )
+        rows = cur.fetchall()
+    return [
+        {
+            "id": r[0], "status": r[1],
+            "started_at": r[2].isoformat(), "finished_at": r[3].isoformat() if r[3] else None,
+            "points_total": r[4], "points_ok": r[5], "points_failed": r[6],
+            "rows_inserted": r[7], "rows_skipped": r[8], "resumes": r[9],
+            "duration_seconds": round(float(r[10]), 1),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,167 @@
+# backend/write_behind.py
+# Bounded in-memory queue that writes rows to Postgres in bulk from a
+# background thread, so request handlers never wait on an INSERT.
+#
+# A batch is flushed when WRITE_BATCH_SIZE rows are waiting or the oldest
+# waiting row is WRITE_FLUSH_SECONDS old. When the queue is full the
+# WRITE_QUEUE_POLICY decides: "drop_newest" rejects the new row,
+# "drop_oldest" evicts the oldest queued row, "block" waits up to
+# WRITE_BLOCK_SECONDS for room (backpressure) and then drops. Async callers
+# use asubmit(), which waits for room on a worker thread, never on the loop.
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from psycopg2.extras import execute_values
+from database import db_cursor
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_SECONDS = float(os.getenv("WRITE_FLUSH_SECONDS", "2"))
+WRITE_QUEUE_MAX = int(os.getenv("WRITE_QUEUE_MAX", "10000"))
+WRITE_QUEUE_POLICY = os.getenv("WRITE_QUEUE_POLICY", "drop_oldest")
+WRITE_BLOCK_SECONDS = float(os.getenv("WRITE_BLOCK_SECONDS", "0.5"))
+POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class WriteBehind:
+    """Queue rows with submit(); flush(rows) is called from the writer thread."""
+
+    def __init__(self, name, flush, batch_size=WRITE_BATCH_SIZE, flush_seconds=WRITE_FLUSH_SECONDS,
+                 max_queue=WRITE_QUEUE_MAX, policy=WRITE_QUEUE_POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of: {', '.join(POLICIES)}")
+        self.name = name
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.policy = policy
+        self._queue = deque()           # (enqueued_at, row)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        self._stats = {"queued": 0, "flushed": 0, "dropped": 0, "failed": 0,
+                       "batches": 0, "flush_errors": 0, "last_flush_ms": None}
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, daemon=True, name=f"write-behind-{self.name}")
+                self._thread.start()
+        return self
+
+    def submit(self, row):
+        """Enqueue one row; returns False if the row was dropped."""
+        with self._cond:
+            if self._closing:
+                self._stats["dropped"] += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self._stats["dropped"] += 1
+                elif self.policy == "block":
+                    deadline = time.monotonic() + WRITE_BLOCK_SECONDS
+                    while len(self._queue) >= self.max_queue and not self._closing:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if len(self._queue) >= self.max_queue or self._closing:
+                        self._stats["dropped"] += 1
+                        return False
+                else:
+                    self._stats["dropped"] += 1
+                    return False
+            self._queue.append((time.monotonic(), row))
+            self._stats["queued"] += 1
+            # First row arms the flush timer; a full batch flushes right away
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    async def asubmit(self, row):
+        """submit() for coroutines; a blocking submit waits in the default executor."""
+        if self.policy != "block":
+            return self.submit(row)      # never waits, only takes the lock
+        return await asyncio.get_running_loop().run_in_executor(None, self.submit, row)
+
+    def _take_batch(self):
+        """Wait until a batch is due, then pop it (empty list once closed and drained)."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._queue[0][0] + self.flush_seconds
+                    if self._closing or len(self._queue) >= self.batch_size or time.monotonic() >= due:
+                        n = min(self.batch_size, len(self._queue))
+                        batch = [self._queue.popleft()[1] for _ in range(n)]
+                        self._cond.notify_all()   # wake producers blocked on a full queue
+                        return batch
+                    self._cond.wait(due - time.monotonic())
+                elif self._closing:
+                    return []
+                else:
+                    self._cond.wait()
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            self._flush(batch)
+        except Exception as e:
+            print(f"[WRITE-BEHIND] {self.name}: flush of {len(batch)} rows failed: {e}")
+            with self._cond:
+                self._stats["flush_errors"] += 1
+                self._stats["failed"] += len(batch)
+            return
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["flushed"] += len(batch)
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=10.0):
+        """Stop accepting rows and flush whatever is queued."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._thread = None
+            leftover = len(self._queue)
+        if leftover:
+            print(f"[WRITE-BEHIND] {self.name}: {leftover} rows not flushed at shutdown")
+
+    def stats(self):
+        with self._cond:
+            out = dict(self._stats)
+            out["pending"] = len(self._queue)
+        out.update(batch_size=self.batch_size, flush_seconds=self.flush_seconds,
+                   max_queue=self.max_queue, policy=self.policy)
+        return out
+
+
+def _insert_air_quality(rows):
+    with db_cursor(commit=True) as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO air_quality
+            (latitude, longitude, aqi, pm25, pm10, co, no2, so2, o3, timestamp)
+            VALUES %s
+            """,
+            rows,
+            page_size=len(rows),
+        )
+
+
+AIR_QUALITY_WRITER = WriteBehind("air_quality", _insert_air_quality)
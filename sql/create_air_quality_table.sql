@@ -0,0 +1,22 @@
+-- Live lookups and user searches, range-partitioned by timestamp.
+-- The primary key has to include the partition key. Partitions are
+-- managed by backend/partitions.py like india_aqi's.
+CREATE TABLE IF NOT EXISTS air_quality (
+  id SERIAL,
+  latitude DOUBLE PRECISION,
+  longitude DOUBLE PRECISION,
+  aqi INTEGER,
+  pm25 DOUBLE PRECISION,
+  pm10 DOUBLE PRECISION,
+  co DOUBLE PRECISION,
+  no2 DOUBLE PRECISION,
+  so2 DOUBLE PRECISION,
+  o3 DOUBLE PRECISION,
+  timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE IF NOT EXISTS air_quality_default PARTITION OF air_quality DEFAULT;
+
+CREATE INDEX IF NOT EXISTS air_quality_geo_idx
+  ON air_quality USING gist (point(longitude, latitude));
@@ -1,7 +1,11 @@
+-- India grid readings, range-partitioned by dt (UTC).
+-- Day (or week) partitions are created ahead of time and dropped past
+-- retention by backend/partitions.py; rows outside every partition land
+-- in india_aqi_default until their partition is created.
 CREATE TABLE IF NOT EXISTS india_aqi (
-  lat DOUBLE PRECISION,
-  lon DOUBLE PRECISION,
-  dt TIMESTAMP,
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  dt TIMESTAMP NOT NULL,
   pm25 DOUBLE PRECISION,
   pm10 DOUBLE PRECISION,
   no2 DOUBLE PRECISION,
@@ -10,4 +14,6 @@ CREATE TABLE IF NOT EXISTS india_aqi (
   co DOUBLE PRECISION,
   aqi INTEGER,
   PRIMARY KEY (lat, lon, dt)
-);
+) PARTITION BY RANGE (dt);
+
+CREATE TABLE IF NOT EXISTS india_aqi_default PARTITION OF india_aqi DEFAULT;
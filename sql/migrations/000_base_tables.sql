@@ -0,0 +1,42 @@
+-- Base tables, for a database that has neither (the same DDL as
+-- sql/create_india_table.sql and sql/create_air_quality_table.sql).
+--
+-- Sorted ahead of the other migrations, which read from or index these
+-- tables. Existing tables are left alone; 007 converts unpartitioned ones.
+DO $$
+BEGIN
+  IF to_regclass('india_aqi') IS NULL THEN
+    CREATE TABLE india_aqi (
+      lat DOUBLE PRECISION NOT NULL,
+      lon DOUBLE PRECISION NOT NULL,
+      dt TIMESTAMP NOT NULL,
+      pm25 DOUBLE PRECISION,
+      pm10 DOUBLE PRECISION,
+      no2 DOUBLE PRECISION,
+      so2 DOUBLE PRECISION,
+      o3 DOUBLE PRECISION,
+      co DOUBLE PRECISION,
+      aqi INTEGER,
+      PRIMARY KEY (lat, lon, dt)
+    ) PARTITION BY RANGE (dt);
+    CREATE TABLE india_aqi_default PARTITION OF india_aqi DEFAULT;
+  END IF;
+
+  IF to_regclass('air_quality') IS NULL THEN
+    CREATE TABLE air_quality (
+      id SERIAL,
+      latitude DOUBLE PRECISION,
+      longitude DOUBLE PRECISION,
+      aqi INTEGER,
+      pm25 DOUBLE PRECISION,
+      pm10 DOUBLE PRECISION,
+      co DOUBLE PRECISION,
+      no2 DOUBLE PRECISION,
+      so2 DOUBLE PRECISION,
+      o3 DOUBLE PRECISION,
+      timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+      PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    CREATE TABLE air_quality_default PARTITION OF air_quality DEFAULT;
+  END IF;
+END $$;
@@ -0,0 +1,21 @@
+-- Spatial access paths for nearest-cell lookups.
+--
+-- india_aqi_cells holds one row per grid cell with its newest reading time,
+-- so nearest-cell searches scan ~1k cells via the (lat, lon) primary key
+-- instead of the whole india_aqi history. The latest reading is then read
+-- through the india_aqi (lat, lon, dt) primary key.
+CREATE TABLE IF NOT EXISTS india_aqi_cells (
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  latest_dt TIMESTAMP NOT NULL,
+  PRIMARY KEY (lat, lon)
+);
+
+INSERT INTO india_aqi_cells (lat, lon, latest_dt)
+SELECT lat, lon, MAX(dt) FROM india_aqi GROUP BY lat, lon
+ON CONFLICT (lat, lon) DO UPDATE
+SET latest_dt = GREATEST(india_aqi_cells.latest_dt, EXCLUDED.latest_dt);
+
+-- Box containment on user lookups (air_quality) is served by a GiST point index.
+CREATE INDEX IF NOT EXISTS air_quality_geo_idx
+  ON air_quality USING gist (point(longitude, latitude));
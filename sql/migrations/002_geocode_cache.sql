@@ -0,0 +1,12 @@
+-- Persistent geocoding results for /aqi/location.
+--
+-- query_key is the normalized "place|country" string. Rows with NULL
+-- coordinates record a "not found" answer so repeated misses don't reach
+-- Nominatim either; they expire on a shorter TTL (see geocode.py).
+CREATE TABLE IF NOT EXISTS geocode_cache (
+  query_key TEXT PRIMARY KEY,
+  lat DOUBLE PRECISION,
+  lon DOUBLE PRECISION,
+  display_name TEXT,
+  fetched_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
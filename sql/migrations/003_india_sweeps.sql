@@ -0,0 +1,28 @@
+-- Progress tracking for India grid sweeps.
+--
+-- Sweep rows are flushed in chunks while the sweep runs. Each flush records
+-- its points in india_sweep_points in the same transaction as the data, so
+-- an interrupted sweep can resume with exactly the points still missing.
+CREATE TABLE IF NOT EXISTS india_sweeps (
+  id SERIAL PRIMARY KEY,
+  started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at TIMESTAMPTZ,
+  status TEXT NOT NULL DEFAULT 'running',   -- running | interrupted | completed | abandoned
+  points_total INTEGER NOT NULL DEFAULT 0,
+  points_ok INTEGER NOT NULL DEFAULT 0,
+  points_failed INTEGER NOT NULL DEFAULT 0,
+  rows_inserted INTEGER NOT NULL DEFAULT 0,
+  rows_skipped INTEGER NOT NULL DEFAULT 0,
+  resumes INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS india_sweeps_status_idx ON india_sweeps (status, started_at DESC);
+
+CREATE TABLE IF NOT EXISTS india_sweep_points (
+  sweep_id INTEGER NOT NULL REFERENCES india_sweeps (id) ON DELETE CASCADE,
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  ok BOOLEAN NOT NULL,
+  PRIMARY KEY (sweep_id, lat, lon)
+);
@@ -0,0 +1,19 @@
+-- Hourly OpenWeather forecasts for the India grid.
+--
+-- Kept apart from india_aqi, which only holds observations. Each sweep
+-- overwrites the forecast for the hours it returns; issued_at records
+-- which sweep a row came from.
+CREATE TABLE IF NOT EXISTS india_aqi_forecast (
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  dt TIMESTAMP NOT NULL,
+  pm25 DOUBLE PRECISION,
+  pm10 DOUBLE PRECISION,
+  no2 DOUBLE PRECISION,
+  so2 DOUBLE PRECISION,
+  o3 DOUBLE PRECISION,
+  co DOUBLE PRECISION,
+  aqi INTEGER,
+  issued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (lat, lon, dt)
+);
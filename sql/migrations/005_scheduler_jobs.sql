@@ -0,0 +1,16 @@
+-- Run history for scheduler.py jobs, shared by every process.
+--
+-- last_slot is the cron slot the job last ran for; a leader that finds a
+-- due slot newer than last_slot runs it (catch-up after downtime).
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+  name TEXT PRIMARY KEY,
+  last_slot TIMESTAMPTZ,
+  last_started_at TIMESTAMPTZ,
+  last_finished_at TIMESTAMPTZ,
+  last_success_at TIMESTAMPTZ,
+  last_duration_s DOUBLE PRECISION,
+  last_status TEXT,                -- running | ok | error | skipped
+  last_error TEXT,
+  runs INTEGER NOT NULL DEFAULT 0,
+  failures INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,60 @@
+-- Per-cell hourly and daily rollups of india_aqi for the history endpoints.
+--
+-- For each pollutant: <m>_n readings, <m>_sum, <m>_sq (sum of squares),
+-- <m>_min and <m>_max, so counts, means, standard deviations and extremes
+-- over any set of buckets and cells are sums/mins/maxes of rollup rows.
+-- rollups.py keeps them current as sweep rows are merged; the statements
+-- below seed them from the rows already stored.
+CREATE TABLE IF NOT EXISTS india_aqi_hourly (
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  bucket TIMESTAMP NOT NULL,       -- date_trunc('hour', dt), UTC
+  n INTEGER NOT NULL DEFAULT 0,    -- readings
+  aqi_n INTEGER NOT NULL DEFAULT 0, aqi_sum DOUBLE PRECISION NOT NULL DEFAULT 0, aqi_sq DOUBLE PRECISION NOT NULL DEFAULT 0, aqi_min DOUBLE PRECISION, aqi_max DOUBLE PRECISION,
+  pm25_n INTEGER NOT NULL DEFAULT 0, pm25_sum DOUBLE PRECISION NOT NULL DEFAULT 0, pm25_sq DOUBLE PRECISION NOT NULL DEFAULT 0, pm25_min DOUBLE PRECISION, pm25_max DOUBLE PRECISION,
+  pm10_n INTEGER NOT NULL DEFAULT 0, pm10_sum DOUBLE PRECISION NOT NULL DEFAULT 0, pm10_sq DOUBLE PRECISION NOT NULL DEFAULT 0, pm10_min DOUBLE PRECISION, pm10_max DOUBLE PRECISION,
+  no2_n INTEGER NOT NULL DEFAULT 0, no2_sum DOUBLE PRECISION NOT NULL DEFAULT 0, no2_sq DOUBLE PRECISION NOT NULL DEFAULT 0, no2_min DOUBLE PRECISION, no2_max DOUBLE PRECISION,
+  so2_n INTEGER NOT NULL DEFAULT 0, so2_sum DOUBLE PRECISION NOT NULL DEFAULT 0, so2_sq DOUBLE PRECISION NOT NULL DEFAULT 0, so2_min DOUBLE PRECISION, so2_max DOUBLE PRECISION,
+  o3_n INTEGER NOT NULL DEFAULT 0, o3_sum DOUBLE PRECISION NOT NULL DEFAULT 0, o3_sq DOUBLE PRECISION NOT NULL DEFAULT 0, o3_min DOUBLE PRECISION, o3_max DOUBLE PRECISION,
+  co_n INTEGER NOT NULL DEFAULT 0, co_sum DOUBLE PRECISION NOT NULL DEFAULT 0, co_sq DOUBLE PRECISION NOT NULL DEFAULT 0, co_min DOUBLE PRECISION, co_max DOUBLE PRECISION,
+  PRIMARY KEY (lat, lon, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS india_aqi_daily (
+  lat DOUBLE PRECISION NOT NULL,
+  lon DOUBLE PRECISION NOT NULL,
+  bucket TIMESTAMP NOT NULL,       -- date_trunc('day', dt), UTC
+  n INTEGER NOT NULL DEFAULT 0,    -- readings
+  aqi_n INTEGER NOT NULL DEFAULT 0, aqi_sum DOUBLE PRECISION NOT NULL DEFAULT 0, aqi_sq DOUBLE PRECISION NOT NULL DEFAULT 0, aqi_min DOUBLE PRECISION, aqi_max DOUBLE PRECISION,
+  pm25_n INTEGER NOT NULL DEFAULT 0, pm25_sum DOUBLE PRECISION NOT NULL DEFAULT 0, pm25_sq DOUBLE PRECISION NOT NULL DEFAULT 0, pm25_min DOUBLE PRECISION, pm25_max DOUBLE PRECISION,
+  pm10_n INTEGER NOT NULL DEFAULT 0, pm10_sum DOUBLE PRECISION NOT NULL DEFAULT 0, pm10_sq DOUBLE PRECISION NOT NULL DEFAULT 0, pm10_min DOUBLE PRECISION, pm10_max DOUBLE PRECISION,
+  no2_n INTEGER NOT NULL DEFAULT 0, no2_sum DOUBLE PRECISION NOT NULL DEFAULT 0, no2_sq DOUBLE PRECISION NOT NULL DEFAULT 0, no2_min DOUBLE PRECISION, no2_max DOUBLE PRECISION,
+  so2_n INTEGER NOT NULL DEFAULT 0, so2_sum DOUBLE PRECISION NOT NULL DEFAULT 0, so2_sq DOUBLE PRECISION NOT NULL DEFAULT 0, so2_min DOUBLE PRECISION, so2_max DOUBLE PRECISION,
+  o3_n INTEGER NOT NULL DEFAULT 0, o3_sum DOUBLE PRECISION NOT NULL DEFAULT 0, o3_sq DOUBLE PRECISION NOT NULL DEFAULT 0, o3_min DOUBLE PRECISION, o3_max DOUBLE PRECISION,
+  co_n INTEGER NOT NULL DEFAULT 0, co_sum DOUBLE PRECISION NOT NULL DEFAULT 0, co_sq DOUBLE PRECISION NOT NULL DEFAULT 0, co_min DOUBLE PRECISION, co_max DOUBLE PRECISION,
+  PRIMARY KEY (lat, lon, bucket)
+);
+
+INSERT INTO india_aqi_hourly (lat, lon, bucket, n, aqi_n, aqi_sum, aqi_sq, aqi_min, aqi_max, pm25_n, pm25_sum, pm25_sq, pm25_min, pm25_max, pm10_n, pm10_sum, pm10_sq, pm10_min, pm10_max, no2_n, no2_sum, no2_sq, no2_min, no2_max, so2_n, so2_sum, so2_sq, so2_min, so2_max, o3_n, o3_sum, o3_sq, o3_min, o3_max, co_n, co_sum, co_sq, co_min, co_max)
+SELECT lat, lon, date_trunc('hour', dt), COUNT(*),
+       COUNT(aqi), COALESCE(SUM(aqi), 0), COALESCE(SUM(aqi::float8 * aqi), 0), MIN(aqi), MAX(aqi),
+       COUNT(pm25), COALESCE(SUM(pm25), 0), COALESCE(SUM(pm25::float8 * pm25), 0), MIN(pm25), MAX(pm25),
+       COUNT(pm10), COALESCE(SUM(pm10), 0), COALESCE(SUM(pm10::float8 * pm10), 0), MIN(pm10), MAX(pm10),
+       COUNT(no2), COALESCE(SUM(no2), 0), COALESCE(SUM(no2::float8 * no2), 0), MIN(no2), MAX(no2),
+       COUNT(so2), COALESCE(SUM(so2), 0), COALESCE(SUM(so2::float8 * so2), 0), MIN(so2), MAX(so2),
+       COUNT(o3), COALESCE(SUM(o3), 0), COALESCE(SUM(o3::float8 * o3), 0), MIN(o3), MAX(o3),
+       COUNT(co), COALESCE(SUM(co), 0), COALESCE(SUM(co::float8 * co), 0), MIN(co), MAX(co)
+FROM india_aqi GROUP BY 1, 2, 3
+ON CONFLICT (lat, lon, bucket) DO NOTHING;
+
+INSERT INTO india_aqi_daily (lat, lon, bucket, n, aqi_n, aqi_sum, aqi_sq, aqi_min, aqi_max, pm25_n, pm25_sum, pm25_sq, pm25_min, pm25_max, pm10_n, pm10_sum, pm10_sq, pm10_min, pm10_max, no2_n, no2_sum, no2_sq, no2_min, no2_max, so2_n, so2_sum, so2_sq, so2_min, so2_max, o3_n, o3_sum, o3_sq, o3_min, o3_max, co_n, co_sum, co_sq, co_min, co_max)
+SELECT lat, lon, date_trunc('day', dt), COUNT(*),
+       COUNT(aqi), COALESCE(SUM(aqi), 0), COALESCE(SUM(aqi::float8 * aqi), 0), MIN(aqi), MAX(aqi),
+       COUNT(pm25), COALESCE(SUM(pm25), 0), COALESCE(SUM(pm25::float8 * pm25), 0), MIN(pm25), MAX(pm25),
+       COUNT(pm10), COALESCE(SUM(pm10), 0), COALESCE(SUM(pm10::float8 * pm10), 0), MIN(pm10), MAX(pm10),
+       COUNT(no2), COALESCE(SUM(no2), 0), COALESCE(SUM(no2::float8 * no2), 0), MIN(no2), MAX(no2),
+       COUNT(so2), COALESCE(SUM(so2), 0), COALESCE(SUM(so2::float8 * so2), 0), MIN(so2), MAX(so2),
+       COUNT(o3), COALESCE(SUM(o3), 0), COALESCE(SUM(o3::float8 * o3), 0), MIN(o3), MAX(o3),
+       COUNT(co), COALESCE(SUM(co), 0), COALESCE(SUM(co::float8 * co), 0), MIN(co), MAX(co)
+FROM india_aqi GROUP BY 1, 2, 3
+ON CONFLICT (lat, lon, bucket) DO NOTHING;
@@ -0,0 +1,42 @@
+-- Range-partition india_aqi (by dt) and air_quality (by timestamp).
+--
+-- Existing tables are swapped for partitioned ones (see
+-- sql/create_india_table.sql and sql/create_air_quality_table.sql) and
+-- their rows copied into the DEFAULT partitions; backend/partitions.py
+-- then moves them into day/week partitions on startup. air_quality keeps
+-- its id sequence; rows without a timestamp can't be placed and are dropped.
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('india_aqi')) = 'r' THEN
+    ALTER TABLE india_aqi RENAME TO india_aqi_unpartitioned;
+    ALTER INDEX india_aqi_pkey RENAME TO india_aqi_unpartitioned_pkey;
+    CREATE TABLE india_aqi (
+      LIKE india_aqi_unpartitioned INCLUDING DEFAULTS,
+      PRIMARY KEY (lat, lon, dt)
+    ) PARTITION BY RANGE (dt);
+    CREATE TABLE india_aqi_default PARTITION OF india_aqi DEFAULT;
+    INSERT INTO india_aqi SELECT * FROM india_aqi_unpartitioned;
+    DROP TABLE india_aqi_unpartitioned;
+  END IF;
+
+  IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('air_quality')) = 'r' THEN
+    ALTER TABLE air_quality RENAME TO air_quality_unpartitioned;
+    ALTER INDEX IF EXISTS air_quality_pkey RENAME TO air_quality_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS air_quality_geo_idx RENAME TO air_quality_unpartitioned_geo_idx;
+    DELETE FROM air_quality_unpartitioned WHERE timestamp IS NULL;
+    CREATE TABLE air_quality (
+      LIKE air_quality_unpartitioned INCLUDING DEFAULTS,
+      PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    ALTER TABLE air_quality ALTER COLUMN timestamp SET DEFAULT now();
+    CREATE TABLE air_quality_default PARTITION OF air_quality DEFAULT;
+    INSERT INTO air_quality SELECT * FROM air_quality_unpartitioned;
+    IF to_regclass('air_quality_id_seq') IS NOT NULL THEN
+      ALTER SEQUENCE air_quality_id_seq OWNED BY air_quality.id;
+    END IF;
+    DROP TABLE air_quality_unpartitioned;
+  END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS air_quality_geo_idx
+  ON air_quality USING gist (point(longitude, latitude));